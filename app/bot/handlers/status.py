@@ -3,6 +3,29 @@ from aiogram import types
 from app.logic import Logic, UserStrategySettings
 
 
+def _latency_text(logic: Logic) -> str:
+    """
+    Функция формирует текст со статистикой задержек обработки сигналов.
+    :param logic:
+    :return:
+    """
+    names: dict[str, str] = {
+        "master_latency": "Доставка сигнала",
+        "queue_wait": "Ожидание в очереди",
+        "master_rtt": "RTT до мастера",
+        "order_ack": "Ответ биржи на ордер",
+    }
+    metrics: dict[str, dict[str, float]] = logic.get_latency_metrics()
+
+    text: str = ""
+    for metric, title in names.items():
+        if metric in metrics:
+            m: dict[str, float] = metrics[metric]
+            text += f"{title}: p50 {m['p50'] * 1000:.0f}мс, p95 {m['p95'] * 1000:.0f}мс, макс. {m['max'] * 1000:.0f}мс\n"
+
+    return f"\n<b>Задержки:</b>\n{text}" if text else ""
+
+
 async def status_command_handler(message: types.Message, logic: Logic) -> types.Message:
     """/status command"""
 
@@ -16,10 +39,11 @@ async def status_command_handler(message: types.Message, logic: Logic) -> types.
             text += (f"▫️ <b>{name}</b>:\n"
                      f"Риск {settings.risk_usdt}$, осталось "
                      f"{settings.trades_count if settings.trades_count else '∞'} сделок\n\n")
+            max_signal_age: str = f" {settings.max_signal_age:g}s" if settings.max_signal_age is not None else ""
             command_to_relaunch += (f"{name} {settings.risk_usdt}$ "
-                                    f"{settings.trades_count if settings.trades_count else ''}\n")
+                                    f"{settings.trades_count if settings.trades_count else ''}{max_signal_age}\n")
         command_to_relaunch += "</pre>"
 
-        return await message.answer(text + command_to_relaunch)
+        return await message.answer(text + command_to_relaunch + _latency_text(logic))
     else:
         return await message.answer("❕ У Вас нет активных стратегий. Используйте команду /trade для запуска.")
@@ -10,11 +10,11 @@ def _parse_command(command: CommandObject) -> list[list]:
     """
     Функция парсит введенную команду с возможностью ввести несколько стратегий в одной команде.
     Возвращает список списков по настройке стратегии вида:
-    [[strategy_name: str, risk_usdt: float, trades_count: int | None], ..., ...].
+    [[strategy_name: str, risk_usdt: float, trades_count: int | None, max_signal_age: float | None], ...].
     :param command:
     :return:
     """
-    strategies_params: list[list[str, float, int | None]] = []  # noqa
+    strategies_params: list[list[str, float, int | None, float | None]] = []  # noqa
 
     for line in command.args.split("\n"):
 
@@ -23,17 +23,23 @@ def _parse_command(command: CommandObject) -> list[list]:
         if not line:
             continue
 
-        if len(line.split(" ")) == 3:
-            strategy_name, risk_usdt_str, trades_count = line.split(" ")
+        # Необязательный максимальный возраст сигнала в конце строки, например "30s"
+        parts: list[str] = line.split()
+        max_signal_age: float | None = None
+        if len(parts) > 2 and parts[-1].lower().endswith("s"):
+            max_signal_age = float(parts.pop()[:-1])
+
+        if len(parts) == 3:
+            strategy_name, risk_usdt_str, trades_count = parts
             trades_count = int(trades_count)
 
-        elif len(line.split(" ")) == 2:
-            strategy_name, risk_usdt_str = line.split(" ")
+        elif len(parts) == 2:
+            strategy_name, risk_usdt_str = parts
             trades_count = None
 
         risk_usdt: float = float(risk_usdt_str.replace("$", "").strip())
 
-        strategies_params.append([strategy_name, risk_usdt, trades_count])  # noqa
+        strategies_params.append([strategy_name, risk_usdt, trades_count, max_signal_age])  # noqa
 
     return strategies_params
 
@@ -56,7 +62,10 @@ async def trade_command_handler(message: types.Message, command: CommandObject,
             f"Например:\n"
             f"<blockquote>/trade btc1min 10$ 10</blockquote>\n\n"
             f"Или:\n"
-            f"<blockquote>/trade eth5min 10$</blockquote>"
+            f"<blockquote>/trade eth5min 10$</blockquote>\n\n"
+            "В конце строки можно указать максимальный возраст сигнала в секундах, более старые "
+            "сигналы не будут исполнены:\n"
+            "<blockquote>/trade btc1min 10$ 10 15s</blockquote>"
         )
 
     try:
@@ -64,12 +73,13 @@ async def trade_command_handler(message: types.Message, command: CommandObject,
     except Exception as e:
         return await message.answer(f"🛑 Произошла ошибка при парсинге сообщения: {e}")
 
-    for strategy_name, risk_usdt, trades_count in strategies_params:
+    for strategy_name, risk_usdt, trades_count, max_signal_age in strategies_params:
         try:
             await logic.add_user_strategy(
                 strategy_name=strategy_name,
                 risk_usdt=risk_usdt,
-                trades_count=trades_count if trades_count else None)
+                trades_count=trades_count if trades_count else None,
+                max_signal_age=max_signal_age)
         except Exception as e:
             await message.answer(f"🛑 Ошибка при запуске стратегии: {e}")
         else:
@@ -2,11 +2,138 @@
 В файле находятся настройки логики.
 """
 
-# Задержка перед переподключением к мастер вебсокету в секундах
-WS_RECONNECT_TIMEOUT: float = 20
+# Задержки перед переподключением к мастер вебсокету в секундах: первая попытка выполняется сразу,
+# дальше задержка растет экспоненциально (с джиттером) от базовой до максимальной
+WS_RECONNECT_BASE_DELAY: float = 0.5
+WS_RECONNECT_MAX_DELAY: float = 20
 
-# Количество рабочих, обрабатывающих сообщение с вебсокета
-WS_WORKERS_COUNT: int = 3
+# Сколько последних айди сигналов хранить, чтобы не исполнять повторно сигналы после переподключения
+WS_SEEN_SIGNALS_LIMIT: int = 1000
+
+# Окно в секундах, в котором одинаковые сигналы без айди считаются копиями одного сигнала
+WS_DEDUPLICATION_WINDOW: float = 5
+
+# Количество одновременных соединений с главным сервером из ключа лицензии.
+# Сигнал исполняется по первой пришедшей копии, остальные копии отбрасываются.
+# По умолчанию одно соединение, несколько соединений включаются явно.
+WS_MASTER_CONNECTIONS_COUNT: int = 1
+
+# Интервал в секундах, с которым по мастер вебсокету отправляется ping для оценки смещения часов и RTT
+WS_PING_INTERVAL: float = 5
+
+# Если мастер отвечает на ping, но от него нет ни одного сообщения дольше этого времени в секундах,
+# соединение считается зависшим и переоткрывается (у библиотеки websockets это около 40 секунд)
+WS_STALL_TIMEOUT: float = 12
+
+# Сколько секунд ждать ответ на ping протокола websocket (его отправляет библиотека каждые WS_PING_INTERVAL).
+# Работает и с мастером, который не отвечает на ping приложения: без ответа за
+# WS_PING_INTERVAL + WS_PROTOCOL_PING_TIMEOUT секунд соединение переоткрывается
+WS_PROTOCOL_PING_TIMEOUT: float = 5
+
+# Время в секундах на закрытие соединения при переподключении
+WS_CLOSE_TIMEOUT: float = 1
+
+# Интервал в секундах, с которым клиент отправляет мастеру статистику задержек
+WS_TELEMETRY_INTERVAL: float = 60
+
+# Максимальный возраст сигнала в секундах по часам главного сервера по умолчанию,
+# более старые сигналы не исполняются (можно изменить для каждой стратегии в /trade)
+SIGNAL_MAX_AGE: float = 30
+
+# Предпочитаемая кодировка сообщений мастер вебсокета: "msgpack" или "json".
+# Согласуется при подключении, если мастер не поддерживает msgpack - используется json
+WS_MASTER_ENCODING: str = "msgpack"
+
+# Время в секундах, в течение которого кешируются ответы главного сервера (лицензия, список стратегий)
+MASTER_API_CACHE_TTL: float = 30
+
+# Таймаут REST запросов к главному серверу в секундах
+MASTER_API_TIMEOUT: float = 5
+
+# Дополнительные адреса главного сервера в формате "host:port", к каждому открывается отдельное соединение
+WS_MASTER_EXTRA_HOSTS: list[str] = []
+
+# Количество шардов, по которым распределяются сигналы с вебсокета по паре (биржа, тикер).
+# Это же максимальное количество рабочих, которые одновременно обрабатывают сигналы.
+WS_SHARDS_COUNT: int = 16
+
+# Время простоя в секундах, после которого рабочий шарда завершается
+WS_WORKER_IDLE_TIMEOUT: float = 60
+
+# Максимальное количество сигналов в очереди одного шарда
+SIGNAL_QUEUE_MAXSIZE: int = 100
+
+# Политика при переполнении очереди шарда: "drop_oldest" - вытеснить самый старый сигнал
+# с наихудшим приоритетом (сигналы активных стратегий вытесняют только алерты), "drop_new" - отбросить новый
+SIGNAL_QUEUE_OVERFLOW: str = "drop_oldest"
+
+# Окно в секундах, в котором сигналы с одинаковой парой (стратегия, тикер) схлопываются в один
+SIGNAL_COLLAPSE_WINDOW: float = 2
+
+# Политика для сигналов разных активных стратегий по одному тикеру, которые пришли одновременно:
+# "first" - исполняется только первый сигнал, остальные пропускаются,
+# "aggregate" - сигналы в ту же сторону объединяются в одну сделку с суммарным риском
+SIGNAL_COALESCE_POLICY: str = "first"
+
+# Сколько секунд ждать сигналы других стратегий по тому же тикеру перед исполнением,
+# 0 - объединяются только сигналы, которые уже есть в очереди
+SIGNAL_COALESCE_WINDOW: float = 0
+
+# Интервал в секундах, с которым при активных стратегиях делается легкий запрос к бирже,
+# чтобы соединение не закрывалось между редкими сигналами (aiohttp закрывает простаивающие через 15 секунд)
+EXCHANGE_KEEP_WARM_INTERVAL: float = 10
+
+# Сколько секунд ждать загрузки информации об округлении монет при подготовке биржи
+EXCHANGE_INFO_READY_TIMEOUT: float = 10
+
+# Бюджет времени в секундах на исполнение сигнала до отправки ордера на вход.
+# Если бюджет исчерпан раньше, сигнал не исполняется, а пользователю сообщается, какой этап не успел.
+SIGNAL_EXECUTION_BUDGET: float = 10
+
+# Таймауты этапов исполнения сигнала в секундах, названия этапов - из ABCExchange.pipeline
+SIGNAL_STAGE_TIMEOUTS: dict[str, float] = {
+    "init_client": 3,
+    "check_position": 3,
+    "prepare": 3,
+}
+
+# Таймаут одного запроса к бирже в секундах
+EXCHANGE_REQUEST_TIMEOUT: float = 5
+
+# Сколько раз повторять отправку ордера, если ее результат неизвестен (таймаут, обрыв соединения).
+# Перед повтором ордер ищется на бирже по детерминированному айди, поэтому повтор не откроет вторую позицию.
+ORDER_PLACE_RETRIES: int = 2
+
+# Пауза перед повторной отправкой ордера в секундах
+ORDER_RETRY_DELAY: float = 0.2
+
+# Сколько ошибок соединения или медленных ответов биржи подряд отключают ее: сигналы по ней сразу
+# отклоняются, а проверка позиций пропускается
+CIRCUIT_FAILURE_THRESHOLD: int = 3
+
+# Через сколько секунд после отключения биржи сделать пробный запрос
+CIRCUIT_RECOVERY_TIMEOUT: float = 30
+
+# Ответ биржи дольше этого времени в секундах считается ошибкой
+CIRCUIT_SLOW_CALL_THRESHOLD: float = 5
+
+# Через что отправлять ордера на bybit.com: "ws" - через постоянное торговое вебсокет соединение
+# (REST используется, пока соединение не установлено), "rest" - только через REST
+BYBIT_ORDER_TRANSPORT: str = "rest"
+
+# Через что отправлять ордера и их отмену на okx.com: "ws" - через приватное вебсокет соединение
+# (REST используется, пока соединение не установлено), "rest" - только через REST.
+# Алго ордера для безубытка всегда отправляются через REST
+OKX_ORDER_TRANSPORT: str = "rest"
+
+# Через что отправлять ордера, запросы статуса ордера и позиции на binance.com: "ws" - через
+# Websocket API фьючерсов (REST используется, пока соединение не установлено), "rest" - только через REST
+BINANCE_ORDER_TRANSPORT: str = "rest"
+
+# Как выставлять стоп-лосс и тейк-профит на binance.com после открытия позиции:
+# "batch" - одним запросом к batchOrders сразу после заполнения ордера на вход,
+# "sequential" - по одному ордеру после дополнительной проверки заполнения
+BINANCE_PROTECTIVE_ORDERS_MODE: str = "sequential"
 
 # Таймаут для проверки открытых позиций без стопа в секудах
 WARDEN_TIMEOUT: int = 60
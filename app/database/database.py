@@ -64,4 +64,7 @@ class Database:
 
         cls._instance = cls(session_maker)
 
+        # Загружаем секретные данные в память, дальше они обновляются через secrets_repo.update
+        await cls._instance.secrets_repo.get()
+
         return cls._instance
@@ -1,8 +1,11 @@
 __all__ = ["SecretsRepository", ]
 
-from sqlalchemy import select
+from typing import Callable
+
+from sqlalchemy import select, inspect
 from sqlalchemy.orm import sessionmaker
 
+from app.config import logger
 from ..models import SecretsORM
 
 
@@ -12,6 +15,37 @@ class SecretsRepository:
     def __init__(self, session_maker: sessionmaker):
         self.session_maker = session_maker
 
+        # Снимок секретных данных в памяти, чтобы не ходить в базу данных на горячем пути
+        self._snapshot: SecretsORM | None = None
+        self._version: int = 0
+        self._subscribers: list[Callable[[SecretsORM], None]] = []
+
+    @property
+    def snapshot(self) -> model | None:
+        """
+        Возвращает последнюю версию секретных данных из памяти без обращения к базе данных.
+        Объект нельзя изменять, для изменения нужно получить модель через get и сохранить через update.
+        :return:
+        """
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        """
+        Номер версии снимка, увеличивается при каждом изменении секретных данных.
+        :return:
+        """
+        return self._version
+
+    def subscribe(self, callback: Callable[[SecretsORM], None]) -> None:
+        """
+        Подписывает функцию на изменение секретных данных.
+        Функция будет вызвана с новым снимком после каждого add или update.
+        :param callback: Функция, которая принимает новый снимок.
+        :return:
+        """
+        self._subscribers.append(callback)
+
     async def add(self, obj: model) -> None:
         """
         Создает запись модели в базе данных.
@@ -21,6 +55,7 @@ class SecretsRepository:
         async with self.session_maker() as session:
             session.add(obj)
             await session.commit()
+        self._set_snapshot(obj)
 
     async def get(self) -> model | None:
         """
@@ -30,7 +65,11 @@ class SecretsRepository:
         """
         async with self.session_maker() as session:
             result = await session.execute(select(self.model).where(self.model.id == 1))
-            return result.scalars().first()
+            obj: SecretsORM | None = result.scalars().first()
+
+        if obj is not None and self._snapshot is None:
+            self._set_snapshot(obj)
+        return obj
 
     async def update(self, obj: model) -> None:
         """
@@ -41,3 +80,22 @@ class SecretsRepository:
         async with self.session_maker() as session:
             await session.merge(obj)
             await session.commit()
+        self._set_snapshot(obj)
+
+    def _set_snapshot(self, obj: model) -> None:
+        """
+        Сохраняет копию модели в памяти и уведомляет подписчиков.
+        Копия нужна, чтобы изменения объекта до вызова update не попадали в снимок.
+        :param obj:
+        :return:
+        """
+        self._snapshot = self.model(**{
+            attr.key: getattr(obj, attr.key) for attr in inspect(self.model).column_attrs
+        })
+        self._version += 1
+
+        for callback in self._subscribers:
+            try:
+                callback(self._snapshot)
+            except Exception as e:
+                logger.exception(f"Error in secrets subscriber {callback}: {e}")
@@ -1,10 +1,59 @@
+import asyncio
+import inspect
+import itertools
+import time
 from abc import ABC, abstractmethod
-from threading import Thread
+from threading import Thread, Event
+from typing import Any
 
-from ..schemas import Signal, UserStrategySettings, BreakevenTask, BreakevenType, Side
+import orjson
+import websockets
+from websockets import WebSocketClientProtocol
+
+from app.config import logger, WS_RECONNECT_BASE_DELAY, WS_RECONNECT_MAX_DELAY
+from app.database import Exchange
+from ..schemas import Signal, UserStrategySettings, BreakevenTask, BreakevenType, Side, ExecutionStage
+from ..utils import AlertWorker, Metrics, ClientPool, Deadline, DeadlineExceeded, CircuitBreakers, CircuitOpenError, \
+    Backoff
+
+
+class TradeWebSocketUnavailable(ConnectionError):
+    """ Запрос не отправлен, потому что торговое вебсокет соединение не установлено, его можно отправить через REST. """
+
+
+class TradeWebSocketClosed(ConnectionError):
+    """ Торговое вебсокет соединение закрылось после отправки запроса, результат запроса неизвестен. """
 
 
 class ABCExchange(ABC):
+    # Биржа, для которой реализован коннектор
+    exchange: Exchange
+
+    # Информация об округлении цен и количества монет на бирже
+    info: "ABCExchangeInfo"
+
+    # Класс, который отслеживает момент для переставления безубытка
+    breakeven_websocket: type["ABCBreakevenWebSocket"]
+
+    # Ошибки соединения и таймауты клиента биржи: после них неизвестно, выполнен ли запрос,
+    # и они считаются отказом биржи в предохранителе
+    transport_errors: tuple[type[Exception], ...] = (TimeoutError, asyncio.TimeoutError, TradeWebSocketClosed)
+
+    # Этапы исполнения сигнала. Шаги одного этапа независимы и выполняются параллельно.
+    # Отмена старых ордеров не выполняется параллельно с проверкой позиции, иначе у уже открытой
+    # позиции будут сняты стоп и тейк. Алерт о запуске стратегии отправляется в фоне,
+    # чтобы медленный телеграм не съедал таймаут этапа и не считался отказом биржи.
+    pipeline: tuple[ExecutionStage, ...] = (
+        ExecutionStage("init_client", ("_init_client",)),
+        ExecutionStage("define_side", ("_define_position_side",)),
+        ExecutionStage("check_position", ("_is_available_to_open_position", "_define_ticker_last_price")),
+        ExecutionStage("prepare", ("_alert_strategy_start", "_cancel_all_orders")),
+        ExecutionStage("define_quantity", ("_define_position_quantity",)),
+        ExecutionStage("entry_order", ("_create_entry_order",), cancellable=False),
+    )
+
+    # Фоновые задачи (алерты), ссылки хранятся до завершения, чтобы задачи не удалил сборщик мусора
+    _background_tasks: set[asyncio.Task] = set()
 
     def __init__(
             self,
@@ -12,11 +61,20 @@ class ABCExchange(ABC):
             user_strategy: UserStrategySettings,
             api_key: str,
             api_secret: str,
-            api_pass: str | None
+            api_pass: str | None,
+            clients: ClientPool,
+            breakers: CircuitBreakers,
+            deadline: Deadline
     ) -> None:
         self._api_key = api_key
         self._api_secret = api_secret
         self._api_pass = api_pass
+        # Общий пул клиентов бирж, клиент берется из него, а не создается на каждый сигнал
+        self._clients = clients
+        # Предохранитель биржи для аккаунта, общий для сигналов и проверки позиций
+        self._breaker = breakers.get(self.exchange, api_key)
+        # Бюджет времени на исполнение сигнала
+        self._deadline = deadline
         self._signal = signal
         self._user_strategy = user_strategy
 
@@ -25,9 +83,178 @@ class ABCExchange(ABC):
         self.last_price: float = NotImplemented
         self.quantity: float = NotImplemented
 
+    @staticmethod
+    @abstractmethod
+    async def create_client(api_key: str, api_secret: str, api_pass: str | None):
+        """ Функция создает клиент биржи для пула клиентов. """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    async def warm_up(client) -> None:
+        """
+        Функция делает легкий запрос через клиент, чтобы открыть или не дать закрыться соединению,
+        и синхронизирует смещение времени с биржей, если клиент его использует.
+        """
+        pass
+
     @abstractmethod
+    async def _init_client(self) -> None:
+        """ Функция берет клиент биржи из пула клиентов. """
+        pass
+
     async def process_signal(self) -> bool:
-        """ Функция обрабатывает полученный сигнал. """
+        """
+        Функция обрабатывает сигнал: выполняет этапы из pipeline и запускает отслеживание безубытка.
+        При успешном исполнении ордеров возвращается True, при неуспешном - False
+        :return:
+        """
+        # Этапы до ордера на вход выполняются под одним предохранителем: сигнал дает один исход для биржи,
+        # и этапы без запросов к бирже (клиент из пула, расчет стороны) не сбрасывают счетчик ошибок
+        # и не считаются пробным запросом. Ожидание заполнения ордера и выставление стопа и тейка
+        # не учитываются, чтобы не считаться медленными ответами биржи.
+        pre_entry: tuple[ExecutionStage, ...] = tuple(
+            itertools.takewhile(lambda stage: stage.cancellable and not stage.after_entry, self.pipeline))
+        try:
+            async with self._breaker.guard(self.transport_errors):
+                for stage in pre_entry:
+                    if not await self._run_stage(stage):
+                        return False
+
+            for stage in self.pipeline[len(pre_entry):]:
+                if not await self._run_stage(stage):
+                    return False
+
+        except CircuitOpenError as e:
+            # Алерт об отключении биржи уже отправлен предохранителем, поэтому здесь только лог
+            logger.warning(f"Signal {self._signal.strategy} on {self.symbol} rejected: {e}")
+            return False
+        except DeadlineExceeded as e:
+            await self._handle_deadline_exceeded(e)
+            return False
+        except Exception as e:
+            logger.exception(f"Error while process signal: {e}")
+            await AlertWorker.error(f"Ошибка при обработке сигнала по {self.symbol}: {e}")
+            return False
+
+        await self.breakeven_websocket(
+            task=BreakevenTask(
+                ticker=self.symbol,
+                stop_loss=self._signal.stop_loss,
+                take_profit=self._signal.take_profit,
+                plus_breakeven=self._signal.plus_breakeven,
+                minus_breakeven=self._signal.minus_breakeven,
+                callback=self._handle_breakeven_event,
+                meta=f"{self.__class__.__name__.lower()} breakeven task"
+            ),
+        ).run()
+
+        return True
+
+    async def _run_stage(self, stage: ExecutionStage) -> bool:
+        """
+        Функция выполняет этап с его таймаутом и сохраняет время выполнения этапа в метрику "stage_<название>".
+        :param stage: Этап
+        Этап после открытия позиции не отменяется и не прерывает исполнение: если он не удался,
+        пользователь получает алерт о позиции без стопа и тейка, а безубыток все равно отслеживается.
+        :raises DeadlineExceeded: если этап не уложился во время.
+        :return: False, если какой-то шаг этапа вернул False.
+        """
+        if stage.after_entry:
+            return await self._run_after_entry_stage(stage)
+
+        with Metrics.measure(f"stage_{stage.name}"):
+            if stage.cancellable:
+                results: list[Any] = await self._deadline.run(stage.name, self._run_steps(stage.steps))
+            else:
+                self._deadline.check(stage.name)
+                results: list[Any] = await self._run_steps(stage.steps)
+
+        return all(result is not False for result in results)
+
+    async def _run_after_entry_stage(self, stage: ExecutionStage) -> bool:
+        """
+        Функция выполняет этап после открытия позиции без таймаута: каждый запрос к бирже
+        и так ограничен EXCHANGE_REQUEST_TIMEOUT.
+        :param stage: Этап
+        :return: Всегда True, позиция уже открыта.
+        """
+        with Metrics.measure(f"stage_{stage.name}"):
+            try:
+                results: list[Any] = await self._run_steps(stage.steps)
+            except Exception as e:
+                logger.exception(f"Error in stage {stage.name} after entry on {self.symbol}: {e}")
+                results: list[Any] = [False]
+
+        if not all(result is not False for result in results):
+            await AlertWorker.error(
+                f"Позиция по {self.symbol} открыта, но этап {stage.name} не выполнен: "
+                f"стоп-лосс и тейк-профит могут быть не выставлены. Проверьте позицию на бирже.")
+        return True
+
+    async def _run_steps(self, steps: tuple[str, ...]) -> list[Any]:
+        """
+        Функция вызывает шаги этапа, асинхронные шаги выполняются параллельно.
+        :param steps: Названия методов
+        :return: Результаты шагов
+        """
+        results: list[Any] = []
+        awaitables: list = []
+        for step in steps:
+            result: Any = getattr(self, step)()
+            if inspect.isawaitable(result):
+                awaitables.append(result)
+            else:
+                results.append(result)
+
+        return results + list(await asyncio.gather(*awaitables))
+
+    async def _handle_deadline_exceeded(self, e: DeadlineExceeded) -> None:
+        """
+        Функция сообщает, что сигнал не исполнен, потому что этап не уложился в бюджет времени.
+        :param e:
+        :return:
+        """
+        _: str = f"Signal {self._signal.strategy} on {self.symbol} abandoned: {e}"
+        logger.warning(_)
+        await AlertWorker.warning(
+            f"Сигнал {self._signal.strategy} по {self.symbol} не исполнен: этап {e.stage} "
+            f"не уложился во время ({e.timeout:.1f} сек.).")
+
+    def _alert_strategy_start(self) -> None:
+        """ Функция в фоне отправляет лог, что начинается обработка стратегии. """
+        task: asyncio.Task = asyncio.create_task(AlertWorker.warning(f"Запуск стратегии {self._signal.strategy}"))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    @abstractmethod
+    async def _create_entry_order(self) -> bool | dict:
+        """ Функция открывает позицию. Возвращает False, если ордер не создан. """
+        pass
+
+    @abstractmethod
+    async def _is_available_to_open_position(self) -> bool:
+        """ Функция определяет можно ли открыть позицию сейчас. """
+        pass
+
+    @abstractmethod
+    async def _define_ticker_last_price(self) -> None:
+        """ Функция получает последнюю цену монеты для определения размера позиции. """
+        pass
+
+    @abstractmethod
+    async def _cancel_all_orders(self) -> None:
+        """ Функция отменяет все открытые ордера по монете. """
+        pass
+
+    @abstractmethod
+    def _define_position_side(self) -> None:
+        """ Функция определяет сторону позиции исходя из положения тейка и стопа. """
+        pass
+
+    @abstractmethod
+    def _define_position_quantity(self) -> None:
+        """ Функция определяет размер позиции. """
         pass
 
     @abstractmethod
@@ -40,7 +267,14 @@ class ABCExchangeInfo(ABC, Thread):
     """
     Класс, который внутри себя обновляет информацию о том, как надо округлять
     цены монет и их количество в ордерах на разных биржах.
+    Между обновлениями поток ждет через _sleep, поэтому обновление можно запросить раньше через refresh.
     """
+    _refresh_event: Event
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        # У каждой биржи свое событие для внепланового обновления
+        cls._refresh_event = Event()
 
     def __init__(self):
         Thread.__init__(self, daemon=True)
@@ -49,6 +283,26 @@ class ABCExchangeInfo(ABC, Thread):
     def run(self) -> None:
         pass
 
+    @abstractmethod
+    def is_ready(self) -> bool:
+        """ Функция проверяет, что информация о монетах загружена. """
+        pass
+
+    @classmethod
+    def refresh(cls) -> None:
+        """ Функция просит поток обновить информацию, не дожидаясь следующего планового обновления. """
+        cls._refresh_event.set()
+
+    @classmethod
+    def _sleep(cls, seconds: float) -> None:
+        """
+        Функция ждет до следующего обновления или до вызова refresh.
+        :param seconds: Время до следующего планового обновления.
+        :return:
+        """
+        cls._refresh_event.wait(seconds)
+        cls._refresh_event.clear()
+
     @abstractmethod
     def round_price(self, symbol: str, price: float) -> float:
         pass
@@ -155,3 +409,166 @@ class ABCBreakevenWebSocket(ABC):
             return Side.SELL
         else:
             return NotImplemented
+
+
+class ABCTradeWebSocket(ABC):
+    """
+    Класс держит постоянное авторизованное вебсокет соединение для торговых запросов, чтобы
+    ордер не ждал установки соединения и HTTP подписи. Соединение одно на клиент (аккаунт)
+    и переподключается при ошибках. Ответы сопоставляются с запросами по айди запроса.
+    Пока соединение не установлено, запросы не отправляются, а вызывается TradeWebSocketUnavailable,
+    чтобы клиент отправил запрос через REST.
+    """
+    url: str
+
+    # Интервал в секундах, с которым отправляется ping биржи, None - только ping фреймы библиотеки
+    ping_interval: float | None = None
+
+    def __init__(self, name: str) -> None:
+        """
+        :param name: Название соединения для логов.
+        """
+        self._name = name
+
+        self._ws: WebSocketClientProtocol | None = None
+        self._is_authorized: bool = False
+        self._task: asyncio.Task | None = None
+        self._counter = itertools.count(1)
+        # Запросы, которые ждут ответа, в формате {айди запроса: future}
+        self._pending: dict[str, asyncio.Future] = {}
+        self._backoff: Backoff = Backoff(base_delay=WS_RECONNECT_BASE_DELAY, max_delay=WS_RECONNECT_MAX_DELAY)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and self._ws.open and self._is_authorized
+
+    def start(self) -> None:
+        """
+        Функция запускает фоновое подключение, если оно еще не запущено.
+        :return:
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """
+        Функция останавливает подключение.
+        :return:
+        """
+        if self._task:
+            self._task.cancel()
+        if self._ws:
+            await self._ws.close()
+        self._fail_pending()
+
+    async def request(self, op: str, args: Any, timeout: float) -> dict:
+        """
+        Функция отправляет запрос и ждет ответ с тем же айди.
+        :param op: Операция, например "order.create".
+        :param args: Аргументы операции.
+        :param timeout: Сколько секунд ждать ответ.
+        :raises TradeWebSocketUnavailable: если соединение не установлено и запрос не отправлен.
+        :raises TradeWebSocketClosed: если соединение закрылось до ответа.
+        :raises asyncio.TimeoutError: если ответ не пришел за timeout.
+        :return:
+        """
+        if not self.is_connected:
+            raise TradeWebSocketUnavailable(f"{self._name} trade ws is not connected")
+
+        request_id: str = str(next(self._counter))
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            try:
+                await self._ws.send(orjson.dumps(self._build_request(request_id, op, args)).decode())
+            except websockets.ConnectionClosed as e:
+                raise TradeWebSocketUnavailable(f"{self._name} trade ws is closed: {e}")
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _run(self) -> None:
+        """
+        Функция в бесконечном цикле подключается, авторизуется и читает ответы.
+        :return:
+        """
+        while True:
+            connected_at: float | None = None
+            ping_task: asyncio.Task | None = None
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self._ws = ws
+                    await self._authenticate(ws)
+                    self._is_authorized = True
+                    connected_at = time.monotonic()
+                    logger.success(f"{self._name} trade ws connected")
+
+                    if self.ping_interval:
+                        ping_task = asyncio.create_task(self._ping(ws))
+                    async for raw in ws:
+                        self._on_raw_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self._name} trade ws error: {e!r}")
+            finally:
+                self._is_authorized = False
+                if ping_task:
+                    ping_task.cancel()
+                self._fail_pending()
+
+            # Как и в MasterConnection, задержка сбрасывается, только если соединение продержалось дольше
+            # максимальной задержки: сервер, который принимает авторизацию и сразу закрывает соединение,
+            # иначе приведет к переподключениям без пауз.
+            if connected_at is not None and time.monotonic() - connected_at > WS_RECONNECT_MAX_DELAY:
+                self._backoff.reset()
+
+            await asyncio.sleep(self._backoff.next_delay())
+
+    def _on_raw_message(self, raw: str | bytes) -> None:
+        """
+        Функция передает ответ в ожидающий его запрос, остальные сообщения (pong и т.п.) пропускаются.
+        :param raw:
+        :return:
+        """
+        try:
+            message: dict = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return
+        if not isinstance(message, dict):
+            return
+
+        future: asyncio.Future | None = self._pending.get(self._get_request_id(message))
+        if future and not future.done():
+            future.set_result(message)
+
+    async def _ping(self, ws: WebSocketClientProtocol) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send(self._ping_message())
+
+    def _fail_pending(self) -> None:
+        """
+        Функция завершает запросы, которые ждали ответа по закрытому соединению.
+        :return:
+        """
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(TradeWebSocketClosed(f"{self._name} trade ws closed before response"))
+        self._pending.clear()
+
+    @abstractmethod
+    async def _authenticate(self, ws: WebSocketClientProtocol) -> None:
+        """ Функция авторизует соединение, при ошибке вызывает ConnectionError. """
+
+    @abstractmethod
+    def _build_request(self, request_id: str, op: str, args: Any) -> dict:
+        """ Функция формирует сообщение запроса в формате биржи. """
+
+    @abstractmethod
+    def _get_request_id(self, message: dict) -> str | None:
+        """ Функция возвращает айди запроса, на который пришел ответ. """
+
+    def _ping_message(self) -> str:
+        """ Функция возвращает ping сообщение биржи. """
+        return orjson.dumps({"op": "ping"}).decode()
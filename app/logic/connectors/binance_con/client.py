@@ -0,0 +1,55 @@
+from binance import AsyncClient as BinanceAsyncClient
+
+from .trade_ws import BinanceTradeWebSocket
+from ..abstract import TradeWebSocketUnavailable
+
+
+class AsyncClient(BinanceAsyncClient):
+    """
+    Клиент python-binance, который может отправлять частые запросы (создание ордера, статус ордера,
+    информация о позиции) через Websocket API фьючерсов. Пока соединение не установлено
+    или транспорт не включен, запросы идут через REST.
+    """
+    trade_ws: BinanceTradeWebSocket | None = None
+
+    def enable_trade_ws(self, request_timeout: float) -> None:
+        """
+        Функция включает отправку запросов через Websocket API и запускает подключение.
+        :param request_timeout: Сколько секунд ждать ответ на запрос.
+        :return:
+        """
+        self.trade_ws = BinanceTradeWebSocket(
+            api_key=self.API_KEY,
+            api_secret=self.API_SECRET,
+            timestamp_offset=lambda: self.timestamp_offset,
+            request_timeout=request_timeout)
+        self.trade_ws.start()
+
+    async def close_connection(self):
+        if self.trade_ws:
+            await self.trade_ws.close()
+        await super().close_connection()
+
+    async def futures_create_order(self, **params):
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.place_order(**params)
+            except TradeWebSocketUnavailable:
+                pass
+        return await super().futures_create_order(**params)
+
+    async def futures_get_order(self, **params):
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.get_order(**params)
+            except TradeWebSocketUnavailable:
+                pass
+        return await super().futures_get_order(**params)
+
+    async def futures_position_information(self, **params):
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.get_position_information(**params)
+            except TradeWebSocketUnavailable:
+                pass
+        return await super().futures_position_information(**params)
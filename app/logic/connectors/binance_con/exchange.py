@@ -1,116 +1,173 @@
 import asyncio
+import time
 from typing import Optional
 
-from binance import AsyncClient
+import aiohttp
 from binance.enums import *
+from binance.exceptions import BinanceAPIException
 
 from app import config
+from app.database import Exchange
 from app.config import log_args, logger, log_errors
+from .client import AsyncClient
 from .exchange_info import exchange_info
 from .breakeven import BinanceBreakevenWebSocket
 from ..abstract import ABCExchange
-from ...utils import AlertWorker
-from ...schemas import BreakevenType, BreakevenTask
+from ...utils import AlertWorker, Metrics, make_client_order_id, place_idempotent
+from ...schemas import BreakevenType, ExecutionStage
 
 
 class Binance(ABCExchange):
     rW: dict[str, int] = {"recvWindow": 1_000}  # the number of milliseconds the request is valid for
+    exchange = Exchange.BINANCE
+    info = exchange_info
+    breakeven_websocket = BinanceBreakevenWebSocket
+    transport_errors = ABCExchange.transport_errors + (aiohttp.ClientError,)
+
+    # Стоп и тейк выставляются после открытия позиции, поэтому этап не отменяется по таймауту
+    pipeline = ABCExchange.pipeline + (
+        ExecutionStage("protective_orders", ("_create_protective_orders",), after_entry=True),
+    )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.binance: AsyncClient | None = None
+        self._entry_order: dict | bool = False
 
-    async def _init_client(self) -> None:
+    @staticmethod
+    async def create_client(api_key: str, api_secret: str, api_pass: str | None) -> AsyncClient:
         """
-        Функция инициализирует клиент для работы с биржей.
+        Функция создает клиент для работы с биржей.
         :return:
         """
-        self.binance = await AsyncClient.create(
-            api_key=self._api_key,
-            api_secret=self._api_secret,
+        client: AsyncClient = await AsyncClient.create(
+            api_key=api_key,
+            api_secret=api_secret,
+            requests_params={"timeout": config.EXCHANGE_REQUEST_TIMEOUT},
         )
+        if config.BINANCE_ORDER_TRANSPORT == "ws":
+            client.enable_trade_ws(request_timeout=config.EXCHANGE_REQUEST_TIMEOUT)
+        return client
 
-    async def process_signal(self) -> bool:
+    @staticmethod
+    async def warm_up(client: AsyncClient) -> None:
         """
-        Функция обрабатывает сигнал и создает ордера на бирже.
-        При успешном исполнении ордеров возвращается True, при неуспешном - False
+        Функция получает время фьючерсного сервера и обновляет смещение времени для подписи запросов.
         :return:
         """
-        try:
-            # Инициализация клиента для работы с биржей
-            await self._init_client()
-
-            # Проверка на то, есть ли уже открытая позицичя по тикеру
-            if not await self._is_available_to_open_position():
-                return False
-
-            # Отправляем лог, что начинается обработка стратегии
-            await AlertWorker.warning(f"Запуск стратегии {self._signal.strategy}")
-
-            # Отменяем все старые ордера, которые были на монете
-            await self.binance.futures_cancel_all_open_orders(symbol=self.symbol)
-
-            # Определяем сторону позиции
-            self._define_position_side()
+        server_time: dict = await client.futures_time()
+        client.timestamp_offset = server_time["serverTime"] - int(time.time() * 1000)
 
-            # Определяем последнюю цену тикера
-            await self._define_ticker_last_price()
-
-            # Определеяем размер позиции исходя из рисков юзера
-            self._define_position_quantity()
-
-            # Создаем аргументы для всех оредров
-            market_order: dict | bool = await self._create_order(
-                self._create_order_kwargs(
-                    type_=FUTURE_ORDER_TYPE_MARKET,
-                    quantity=self.quantity,
-                    side=self.side,
-                ))
+    async def _init_client(self) -> None:
+        """
+        Функция берет клиент для работы с биржей из пула клиентов.
+        :return:
+        """
+        self.binance = await self._clients.get(self.exchange, self._api_key, self._api_secret)
 
-            if not market_order:
-                return False
+    async def _create_entry_order(self) -> dict | bool:
+        """
+        Функция создает рыночный ордер на вход и запоминает его для выставления стопа и тейка.
+        :return:
+        """
+        self._entry_order = await self._create_order(
+            self._create_order_kwargs(
+                type_=FUTURE_ORDER_TYPE_MARKET,
+                quantity=self.quantity,
+                side=self.side,
+                client_order_id=make_client_order_id(self._signal, "entry"),
+            ))
+        # False останавливает исполнение сигнала: без открытой позиции стоп и тейк не выставляются
+        return self._entry_order or False
+
+    async def _create_protective_orders(self) -> None:
+        """
+        Функция выставляет стоп-лосс и тейк-профит после открытия позиции: одним пакетным запросом
+        или, если BINANCE_PROTECTIVE_ORDERS_MODE = "sequential", по одному после проверки заполнения.
+        :return:
+        """
+        if config.BINANCE_PROTECTIVE_ORDERS_MODE == "batch":
+            return await self._create_protective_orders_batch()
 
-            # Ждем пока ордер заполнится
-            await self._w8_till_order_filled(order_id=market_order["orderId"])
+        # Ждем пока ордер заполнится
+        await self._w8_till_order_filled(order_id=self._entry_order["orderId"])
 
-            _: dict | bool = await self._create_order(
-                self._create_order_kwargs(
-                    type_=FUTURE_ORDER_TYPE_STOP_MARKET,
-                    side=SIDE_BUY if self.side == SIDE_SELL else SIDE_SELL,
-                    stop_price=self._signal.stop_loss,
-                    close_position=True
-                ))
+        for order in self._protective_orders_kwargs():
+            _: dict | bool = await self._create_order(order)
 
-            _: dict | bool = await self._create_order(
-                self._create_order_kwargs(
-                    type_=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET,
-                    side=SIDE_BUY if self.side == SIDE_SELL else SIDE_SELL,
-                    stop_price=self._signal.take_profit,
-                    close_position=True
-                )
-            )
+    async def _create_protective_orders_batch(self) -> None:
+        """
+        Функция выставляет стоп-лосс и тейк-профит одним запросом к batchOrders.
+        Ордер на вход к этому моменту уже заполнен: _create_order возвращает рыночный ордер только
+        после заполнения, поэтому отдельное ожидание не нужно.
+        batchOrders не принимает closePosition, поэтому ордера выставляются как reduceOnly
+        на заполненное количество ордера на вход.
+        Ордера, которые не создались в пакете, ищутся по айди и создаются по одному,
+        а пользователь получает один отчет по всем ордерам.
+        :return:
+        """
+        if not isinstance(self._entry_order, dict) or self._entry_order.get("status") != "FILLED":
+            raise Exception(f"Entry order is not filled: {self._entry_order}")
 
-        except Exception as e:
-            logger.exception(f"Error while process signal: {e}")
-            await AlertWorker.error(f"Ошибка при обработке сигнала: {e}")
-            return False
+        orders: list[dict] = self._protective_orders_kwargs(quantity=float(self._entry_order["executedQty"]))
+        try:
+            with Metrics.measure("order_ack"):
+                results: list[dict] = await self.binance.futures_place_batch_order(batchOrders=orders)
+        except self.transport_errors as e:
+            # Результат пакета неизвестен, каждый ордер будет найден по айди или создан заново
+            logger.warning(f"Batch orders result is unknown: {e!r}")
+            results: list[dict] = [{"code": None, "msg": repr(e)} for _ in orders]
+
+        report: list[str] = []
+        is_all_created: bool = True
+        for order, result in zip(orders, results):
+            if "orderId" in result:
+                logger.debug(f"Order created: {result}")
+                report.append(f"{order['type']}: создан")
+                continue
+
+            logger.error(f"Error while creating {order['type']} in batch: {result}")
+            created: dict | None | bool = await self._find_order(order["newClientOrderId"])
+            if created is None:
+                created = await self._create_order(order)
+            is_all_created = is_all_created and bool(created)
+            report.append(f"{order['type']}: ошибка в пакете ({result.get('code')} {result.get('msg')}), "
+                          + ("создан отдельно" if created else "НЕ СОЗДАН"))
+
+        text: str = f"Ордера по {self.symbol}:\n" + "\n".join(report)
+        if is_all_created:
+            await AlertWorker.success(text)
         else:
-            await BinanceBreakevenWebSocket(
-                task=BreakevenTask(
-                    ticker=self.symbol,
-                    stop_loss=self._signal.stop_loss,
-                    take_profit=self._signal.take_profit,
-                    plus_breakeven=self._signal.plus_breakeven,
-                    minus_breakeven=self._signal.minus_breakeven,
-                    callback=self._handle_breakeven_event,
-                    meta="binance breakeven task"
-                ),
-            ).run()
-
-            return True
-        finally:
-            await self.binance.close_connection()
+            await AlertWorker.error(text)
+
+    def _protective_orders_kwargs(self, quantity: float = 0) -> list[dict]:
+        """
+        Функция возвращает аргументы стоп-лосса и тейк-профита на закрытие позиции.
+        :param quantity: Количество монет для reduceOnly ордеров. Если 0,
+            ордера закрывают всю позицию (closePosition).
+        :return:
+        """
+        return [
+            self._create_order_kwargs(
+                type_=FUTURE_ORDER_TYPE_STOP_MARKET,
+                side=SIDE_BUY if self.side == SIDE_SELL else SIDE_SELL,
+                stop_price=self._signal.stop_loss,
+                quantity=quantity,
+                reduce_only=bool(quantity),
+                close_position=not quantity,
+                client_order_id=make_client_order_id(self._signal, "stop_loss"),
+            ),
+            self._create_order_kwargs(
+                type_=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET,
+                side=SIDE_BUY if self.side == SIDE_SELL else SIDE_SELL,
+                stop_price=self._signal.take_profit,
+                quantity=quantity,
+                reduce_only=bool(quantity),
+                close_position=not quantity,
+                client_order_id=make_client_order_id(self._signal, "take_profit"),
+            ),
+        ]
 
     @log_errors
     async def _w8_till_order_filled(self, order_id: int) -> None:
@@ -146,11 +203,8 @@ class Binance(ABCExchange):
         :param be_type: Исходя из этого параметра понятно какой тип ордера выставлять.
         :return:
         """
-        # Need to renew instance of client to avoid RuntimeError: Session is closed
-        self.binance = await AsyncClient.create(
-            api_key=self._api_key,
-            api_secret=self._api_secret
-        )
+        # Клиент мог быть пересоздан в пуле, если за время жизни позиции изменились ключи
+        await self._init_client()
 
         try:
             await AlertWorker.warning(f"Пытаюсь переставить безубыток на стратегии {self._signal.strategy}. "
@@ -176,22 +230,22 @@ class Binance(ABCExchange):
                     type_=FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET,
                     side=be_side,
                     stop_price=be_price,
-                    close_position=True
+                    close_position=True,
+                    client_order_id=make_client_order_id(self._signal, "breakeven_minus"),
                 )
             elif be_type == BreakevenType.PLUS:
                 be_kwargs: dict = self._create_order_kwargs(
                     type_=FUTURE_ORDER_TYPE_STOP_MARKET,
                     side=be_side,
                     close_position=True,
-                    stop_price=be_price
+                    stop_price=be_price,
+                    client_order_id=make_client_order_id(self._signal, "breakeven_plus"),
                 )
 
             # Исполняем ордер
             await self._create_order(be_kwargs)
         except Exception:
             raise
-        finally:
-            await self.binance.close_connection()
 
     async def _is_available_to_open_position(self) -> bool:
         """
@@ -204,6 +258,13 @@ class Binance(ABCExchange):
             return False
         return True
 
+    async def _cancel_all_orders(self) -> None:
+        """
+        Функция отменяет все старые ордера, которые были на монете.
+        :return:
+        """
+        await self.binance.futures_cancel_all_open_orders(symbol=self.symbol)
+
     async def _define_ticker_last_price(self) -> None:
         """
         Функция получает и возвращает последнюю цену монеты для определения размера позиции.
@@ -239,8 +300,10 @@ class Binance(ABCExchange):
         :param order:
         :return:
         """
-        r: dict = await self.binance.futures_create_order(**order)
-        if r.get("status") == "NEW":
+        with Metrics.measure("order_ack"):
+            r: dict = await self._place_order(order)
+        # Ордер, найденный после неудачной попытки, мог уже исполниться
+        if r.get("status") in ["NEW", "PARTIALLY_FILLED", "FILLED"]:
             logger.debug(f"Order created: {r}")
 
             await AlertWorker.success(f"Создан {r['type']} ордер на {r['symbol']}")
@@ -265,17 +328,52 @@ class Binance(ABCExchange):
                     for retry in range(1, 4):
                         try:
                             r = await self.binance.futures_get_order(symbol=r["symbol"], orderId=r["orderId"])
+                            break
                         except Exception as e:
                             if retry >= 3:
                                 raise e
                             else:
                                 logger.error(f"Error while getting order status: {e}")
                                 await asyncio.sleep(0.1)
+
+            # Ордер так и не заполнился, позиция считается неоткрытой
+            logger.error(f"Order {r} was not filled in time")
+            await AlertWorker.error(f"Ордер по {r['symbol']} не заполнился: {r.get('status')}")
+            return False
         else:
             logger.error(f"Error while creating order: {r}")
             await AlertWorker.error(f"Ошибка при создании ордера: {r}")
             return False
 
+    async def _place_order(self, order: dict) -> dict:
+        """
+        Функция отправляет ордер. Если у ордера есть айди, то при таймауте или обрыве соединения
+        отправка повторяется, а перед повтором ордер ищется по айди, чтобы не открыть вторую позицию.
+        :param order:
+        :return:
+        """
+        if "newClientOrderId" not in order:
+            return await self.binance.futures_create_order(**order)
+
+        return await place_idempotent(
+            place=lambda: self.binance.futures_create_order(**order),
+            lookup=lambda: self._find_order(order["newClientOrderId"]),
+            errors=self.transport_errors)
+
+    async def _find_order(self, client_order_id: str) -> dict | None:
+        """
+        Функция ищет ордер по айди, возвращает None, если такого ордера нет.
+        :param client_order_id:
+        :return:
+        """
+        try:
+            return await self.binance.futures_get_order(symbol=self.symbol, origClientOrderId=client_order_id)
+        except BinanceAPIException as e:
+            # -2013: Order does not exist
+            if e.code == -2013:
+                return None
+            raise
+
     def _define_position_quantity(self) -> None:
         """
         Функция определяет размер позиции.
@@ -332,6 +430,12 @@ class Binance(ABCExchange):
             kwargs['stopPrice'] = str(stop_price)
             kwargs['price'] = str(price)
 
+        elif type_ in (FUTURE_ORDER_TYPE_STOP_MARKET, FUTURE_ORDER_TYPE_TAKE_PROFIT_MARKET) and reduce_only:
+            # Ордер на часть позиции, closePosition с reduceOnly и quantity не сочетается
+            kwargs['stopPrice'] = str(stop_price)
+            kwargs['reduceOnly'] = 'true'
+            kwargs['quantity'] = str(quantity)
+
         elif type_ == FUTURE_ORDER_TYPE_STOP_MARKET:
             kwargs['stopPrice'] = str(stop_price)
             kwargs['closePosition'] = str(close_position)
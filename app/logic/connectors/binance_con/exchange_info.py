@@ -4,7 +4,6 @@ Module that rounds prices and quantities for symbols
 __all__ = ["exchange_info", ]
 
 import re
-import time
 
 from binance import Client
 
@@ -48,7 +47,15 @@ class ExchangeInfo(ABCExchangeInfo):
 
             except Exception as e:
                 logger.error(f"Preisions error: {e}")
-            time.sleep(60 * 60)
+            cls._sleep(60 * 60)
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """
+        Check that symbols data is loaded
+        :return:
+        """
+        return bool(cls.precisions)
 
     @classmethod
     def round_price(cls, symbol: str, price: float) -> float:
@@ -0,0 +1,78 @@
+import hashlib
+import hmac
+import time
+from typing import Any, Callable
+
+import orjson
+from binance.exceptions import BinanceAPIException
+from websockets import WebSocketClientProtocol
+
+from ..abstract import ABCTradeWebSocket
+
+
+class BinanceTradeWebSocket(ABCTradeWebSocket):
+    """
+    Соединение с Websocket API фьючерсов binance.com. Каждый запрос подписывается отдельно,
+    поэтому авторизация соединения не нужна, а ping фреймы сервера обрабатывает библиотека.
+    Ответы возвращаются в формате REST ответов, ошибки вызываются как BinanceAPIException.
+    """
+    url: str = "wss://ws-fapi.binance.com/ws-fapi/v1"
+
+    def __init__(
+            self,
+            api_key: str,
+            api_secret: str,
+            timestamp_offset: Callable[[], float],
+            request_timeout: float
+    ) -> None:
+        """
+        :param api_key:
+        :param api_secret:
+        :param timestamp_offset: Функция, которая возвращает смещение времени биржи в миллисекундах.
+        :param request_timeout: Сколько секунд ждать ответ на запрос.
+        """
+        super().__init__(name="binance.com")
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._timestamp_offset = timestamp_offset
+        self._request_timeout = request_timeout
+
+    async def place_order(self, **params) -> dict:
+        return await self._signed_request("order.place", params)
+
+    async def get_order(self, **params) -> dict:
+        return await self._signed_request("order.status", params)
+
+    async def get_position_information(self, **params) -> list[dict]:
+        return await self._signed_request("account.position", params)
+
+    async def _signed_request(self, method: str, params: dict) -> Any:
+        """
+        Функция подписывает и отправляет запрос.
+        :param method: Метод Websocket API, например "order.place".
+        :param params: Параметры запроса.
+        :raises BinanceAPIException: если биржа вернула ошибку.
+        :return: Поле result ответа.
+        """
+        params: dict = {
+            **params,
+            "apiKey": self._api_key,
+            "timestamp": int(time.time() * 1000 + self._timestamp_offset()),
+        }
+        payload: str = "&".join(f"{key}={value}" for key, value in sorted(params.items()))
+        params["signature"] = hmac.new(
+            self._api_secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+        response: dict = await self.request(method, params, self._request_timeout)
+        if response.get("status") != 200:
+            raise BinanceAPIException(None, response.get("status"), orjson.dumps(response.get("error", {})).decode())
+        return response["result"]
+
+    async def _authenticate(self, ws: WebSocketClientProtocol) -> None:
+        pass
+
+    def _build_request(self, request_id: str, op: str, args: Any) -> dict:
+        return {"id": request_id, "method": op, "params": args}
+
+    def _get_request_id(self, message: dict) -> str | None:
+        return message.get("id")
@@ -1,18 +1,21 @@
 import asyncio
 
-from binance import AsyncClient
 from binance.enums import *
 
 from app.config import WARDEN_TIMEOUT, logger
-from app.database import SecretsORM, Database
-from app.logic.utils import AlertWorker
+from app.database import SecretsORM, Database, Exchange
+from app.logic.utils import AlertWorker, ClientPool, CircuitBreakers, CircuitOpenError
+from .client import AsyncClient
+from .exchange import Binance
 from ..abstract import ABCPositionWarden
 
 
 class BinanceWarden(ABCPositionWarden):
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, clients: ClientPool, breakers: CircuitBreakers):
         self._db = db
+        self._clients = clients
+        self._breakers = breakers
         self._client: AsyncClient | None = None
 
     async def start_warden(self) -> None:
@@ -24,37 +27,38 @@ class BinanceWarden(ABCPositionWarden):
         prev_iteration_positions: list[dict] = []
 
         while True:
-            secrets: SecretsORM = await self._db.secrets_repo.get()
+            secrets: SecretsORM = self._db.secrets_repo.snapshot
             if all([secrets.binance_api_secret, secrets.binance_api_key]):
                 try:
-                    if self._client:
-                        await self._client.close_connection()
-                    self._client: AsyncClient = await AsyncClient.create(
-                        api_key=secrets.binance_api_key,
-                        api_secret=secrets.binance_api_secret)
-                    orders: list[dict] = await self._get_open_orders()  # Получаем все открытые ордера
-                    positions: list[dict] = await self._get_open_positions()  # Получаем все открытые позиции
-
-                    # Получаем позиции, которые нужно закрыть
-                    curr_iteration_positions: list[dict] = self._check_positions_health(
-                        orders=orders,
-                        positions=positions)
-                    if curr_iteration_positions:
-                        logger.info(f"Find positions to w/o stop: {curr_iteration_positions}")
-
-                    # Получаем позиции, которые совпали с прошлой итерацией (подтверждение на закрытие)
-                    positions_to_close: list[dict] = self._find_common_elements(
-                        curr_iteration=curr_iteration_positions,
-                        prev_iteration=prev_iteration_positions)
-                    if positions_to_close:
-                        logger.warning(f"I should close positions: {positions_to_close}")
-
-                    # Обновляем историю найденных позиций
-                    prev_iteration_positions = curr_iteration_positions
-
-                    # Закрываем все позиции, которые нужны закрыть
-                    await self._close_positions(positions_to_close)
-
+                    # Пока биржа отключена предохранителем, проверка пропускается
+                    async with self._breakers.get(Exchange.BINANCE, secrets.binance_api_key).guard(Binance.transport_errors):
+                        self._client: AsyncClient = await self._clients.get(
+                            Exchange.BINANCE, secrets.binance_api_key, secrets.binance_api_secret)
+                        orders: list[dict] = await self._get_open_orders()  # Получаем все открытые ордера
+                        positions: list[dict] = await self._get_open_positions()  # Получаем все открытые позиции
+
+                        # Получаем позиции, которые нужно закрыть
+                        curr_iteration_positions: list[dict] = self._check_positions_health(
+                            orders=orders,
+                            positions=positions)
+                        if curr_iteration_positions:
+                            logger.info(f"Find positions to w/o stop: {curr_iteration_positions}")
+
+                        # Получаем позиции, которые совпали с прошлой итерацией (подтверждение на закрытие)
+                        positions_to_close: list[dict] = self._find_common_elements(
+                            curr_iteration=curr_iteration_positions,
+                            prev_iteration=prev_iteration_positions)
+                        if positions_to_close:
+                            logger.warning(f"I should close positions: {positions_to_close}")
+
+                        # Обновляем историю найденных позиций
+                        prev_iteration_positions = curr_iteration_positions
+
+                        # Закрываем все позиции, которые нужны закрыть
+                        await self._close_positions(positions_to_close)
+
+                except CircuitOpenError as e:
+                    logger.info(f"Skip binance warden iteration: {e}")
                 except Exception as e:
                     logger.error(f"Error in binance warden: {e}")
             else:
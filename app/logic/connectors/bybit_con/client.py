@@ -7,12 +7,16 @@ import httpx
 import orjson
 from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 
+from .trade_ws import BybitTradeWebSocket
+from ..abstract import TradeWebSocketUnavailable
+
 
 class BaseClient:
     API_URL = "https://api.bybit.com/"
     API_VERSION = "v5"
 
     REQUEST_TIMEOUT: float = 5
+    KEEPALIVE_EXPIRY: float = 60
 
     def __init__(
             self,
@@ -76,9 +80,20 @@ class AsyncClient(BaseClient):
             api_key: str | None = None,
             api_secret: str | None = None,
             receive_window: int = 5000,
+            trade_ws: bool = False,
     ):
+        """
+        :param trade_ws: Отправлять ордера через торговый вебсокет, REST остается запасным вариантом.
+        """
         super().__init__(api_key, api_secret, receive_window)
-        self.session: httpx.AsyncClient = httpx.AsyncClient(http2=True)
+        self.session: httpx.AsyncClient = httpx.AsyncClient(
+            http2=True, timeout=self.REQUEST_TIMEOUT, limits=httpx.Limits(keepalive_expiry=self.KEEPALIVE_EXPIRY))
+        self.trade_ws: BybitTradeWebSocket | None = BybitTradeWebSocket(
+            api_key=api_key,
+            api_secret=api_secret,
+            timestamp_offset=lambda: self.timestamp_offset,
+            request_timeout=self.REQUEST_TIMEOUT,
+        ) if trade_ws else None
 
     @classmethod
     async def create(
@@ -86,14 +101,14 @@ class AsyncClient(BaseClient):
             api_key: str | None = None,
             api_secret: str | None = None,
             receive_window: int = 5000,
+            trade_ws: bool = False,
     ) -> "AsyncClient":
-        self = cls(api_key, api_secret, receive_window)
+        self = cls(api_key, api_secret, receive_window, trade_ws)
 
         try:
-            # calculate timestamp offset between local and coinex server
-            res = await self.get_server_time()
-            self.timestamp_offset = 1000 * (int(res["result"]["timeSecond"]) - int(time.time()))
-
+            await self.sync_timestamp_offset()
+            if self.trade_ws:
+                self.trade_ws.start()
             return self
         except Exception:
             # If ping throw an exception, the current self must be cleaned
@@ -101,6 +116,11 @@ class AsyncClient(BaseClient):
             await self.close_connection()
             raise
 
+    async def sync_timestamp_offset(self) -> None:
+        """Calculate timestamp offset between local and bybit server"""
+        res = await self.get_server_time()
+        self.timestamp_offset = int(res["time"]) - int(time.time() * 1000)
+
     async def __aenter__(self):
         return self
 
@@ -108,6 +128,8 @@ class AsyncClient(BaseClient):
         await self.session.aclose()
 
     async def close_connection(self):
+        if self.trade_ws:
+            await self.trade_ws.close()
         if self.session:
             assert self.session
             await self.session.aclose()
@@ -165,12 +187,27 @@ class AsyncClient(BaseClient):
         return await self._get("market/tickers", **kwargs)
 
     async def place_order(self, **kwargs) -> dict:
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.place_order(**kwargs)
+            except TradeWebSocketUnavailable:
+                pass
         return await self._post("order/create", **kwargs, signed=True)
 
     async def amend_order(self, **kwargs) -> dict:
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.amend_order(**kwargs)
+            except TradeWebSocketUnavailable:
+                pass
         return await self._post("order/amend", **kwargs, signed=True)
 
     async def cancel_order(self, **kwargs) -> dict:
+        if self.trade_ws:
+            try:
+                return await self.trade_ws.cancel_order(**kwargs)
+            except TradeWebSocketUnavailable:
+                pass
         return await self._post("order/cancel", **kwargs, signed=True)
 
     async def cancel_all_orders(self, **kwargs) -> dict:
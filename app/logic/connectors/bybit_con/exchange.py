@@ -1,14 +1,21 @@
-from app.config import logger, log_errors, BREAKEVEN_STEP_PERCENT
+import httpx
+
+from app.config import logger, log_errors, BREAKEVEN_STEP_PERCENT, BYBIT_ORDER_TRANSPORT
+from app.database import Exchange
 from .breakeven import BybitBreakevenWebSocket
 from .client import AsyncClient
 from .exchange_info import exchange_info
 from ..abstract import ABCExchange
-from ...schemas import BreakevenType, BreakevenTask
-from ...utils import AlertWorker
+from ...schemas import BreakevenType
+from ...utils import AlertWorker, Metrics, make_client_order_id, place_idempotent
 
 
 class Bybit(ABCExchange):
     category: str = "linear"
+    exchange = Exchange.BYBIT
+    info = exchange_info
+    breakeven_websocket = BybitBreakevenWebSocket
+    transport_errors = ABCExchange.transport_errors + (httpx.TransportError,)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -17,66 +24,32 @@ class Bybit(ABCExchange):
 
         self.bybit: AsyncClient | None = None
 
-    async def _init_client(self) -> None:
+    @staticmethod
+    async def create_client(api_key: str, api_secret: str, api_pass: str | None) -> AsyncClient:
         """
-        Функция инициализирует клиент биржи.
+        Функция создает клиент биржи.
         :return:
         """
-        self.bybit = await AsyncClient.create(
-            api_key=self._api_key,
-            api_secret=self._api_secret,
+        return await AsyncClient.create(
+            api_key=api_key,
+            api_secret=api_secret,
+            trade_ws=BYBIT_ORDER_TRANSPORT == "ws",
         )
 
-    async def process_signal(self) -> bool:
+    @staticmethod
+    async def warm_up(client: AsyncClient) -> None:
         """
-        Функция обрабатывает сигнал и создает ордера на бирже.
-        При успешном исполнении ордеров возвращается True, при неуспешном - False
+        Функция получает время сервера и обновляет смещение времени для подписи запросов.
         :return:
         """
-        try:
-            # Инициализация клиента для работы с биржей
-            await self._init_client()
-
-            # Проверка на то, есть ли уже открытая позицичя по тикеру
-            if not await self._is_available_to_open_position():
-                return False
-
-            # Отправляем лог, что начинается обработка стратегии
-            await AlertWorker.warning(f"Запуск стратегии {self._signal.strategy}")
-
-            # Отменяем все старые ордера, которые были на монете
-            await self.bybit.cancel_all_orders(category=self.category, symbol=self.symbol)
-
-            # Определяем сторону позиции
-            self._define_position_side()
-
-            # Определяем последнюю цену тикера
-            await self._define_ticker_last_price()
-
-            # Определеяем размер позиции исходя из рисков юзера
-            self._define_position_quantity()
+        await client.sync_timestamp_offset()
 
-            # Открываем маркет ордер (байбит позволяет сразу указать стоп и тейк)
-            await self._create_market_order()
-
-        except Exception as e:
-            logger.exception(f"Error while process signal: {e}")
-            await AlertWorker.send(f"Ошибка при обработке сигнала: {e}")
-            return False
-
-        else:
-            await BybitBreakevenWebSocket(
-                task=BreakevenTask(
-                    ticker=self.symbol,
-                    stop_loss=self._signal.stop_loss,
-                    take_profit=self._signal.take_profit,
-                    plus_breakeven=self._signal.plus_breakeven,
-                    minus_breakeven=self._signal.minus_breakeven,
-                    callback=self._handle_breakeven_event
-                ),
-            ).run()
-
-            return True
+    async def _init_client(self) -> None:
+        """
+        Функция берет клиент биржи из пула клиентов.
+        :return:
+        """
+        self.bybit = await self._clients.get(self.exchange, self._api_key, self._api_secret)
 
     @log_errors
     async def _handle_breakeven_event(self, be_type: BreakevenType):
@@ -86,6 +59,9 @@ class Bybit(ABCExchange):
         :param be_type: Исходя из этого параметра понятно какой тип ордера выставлять.
         :return:
         """
+        # Клиент мог быть пересоздан в пуле, если за время жизни позиции изменились ключи
+        await self._init_client()
+
         await AlertWorker.warning(f"Пытаюсь переставить безубыток на стратегии {self._signal.strategy}. "
                                   f"Дождитесь сообщения об успешном создании ордера.")
         position_info: dict = await self.bybit.get_position_info(
@@ -127,6 +103,13 @@ class Bybit(ABCExchange):
             await AlertWorker.error(_)
             raise ConnectionError(_)
 
+    async def _cancel_all_orders(self) -> None:
+        """
+        Функция отменяет все старые ордера, которые были на монете.
+        :return:
+        """
+        await self.bybit.cancel_all_orders(category=self.category, symbol=self.symbol)
+
     async def _define_ticker_last_price(self) -> None:
         """
         Функция получает и возвращает последнюю цену монеты для определения размера позиции.
@@ -175,9 +158,9 @@ class Bybit(ABCExchange):
             return False
         return True
 
-    async def _create_market_order(self) -> dict:
+    async def _create_entry_order(self) -> dict:
         """
-        Функция создает рыночный ордер.
+        Функция создает рыночный ордер (байбит позволяет сразу указать стоп и тейк).
 
         Пример успешного ответа при создании ордера:
         {'retCode': 0, 'retMsg': 'OK',
@@ -194,10 +177,16 @@ class Bybit(ABCExchange):
             orderType="Market",
             takeProfit=str(exchange_info.round_price(self.symbol, self._signal.take_profit)),
             stopLoss=str(exchange_info.round_price(self.symbol, self._signal.stop_loss)),
-            qty=str(exchange_info.round_quantity(self.symbol, self.quantity)))
+            qty=str(exchange_info.round_quantity(self.symbol, self.quantity)),
+            orderLinkId=make_client_order_id(self._signal, "entry"))
         logger.debug(f"Try to open order with {params=}")
 
-        responce = await self.bybit.place_order(**params)
+        # При таймауте ордер ищется по orderLinkId и отправляется повторно, только если его нет
+        with Metrics.measure("order_ack"):
+            responce = await place_idempotent(
+                place=lambda: self.bybit.place_order(**params),
+                lookup=lambda: self._find_order(params["orderLinkId"]),
+                errors=self.transport_errors)
 
         if responce.get("retMsg") == "OK":
             await AlertWorker.success(f"Открыт ордер по {self.symbol} размером {params['qty']},"
@@ -206,3 +195,31 @@ class Bybit(ABCExchange):
         else:
             logger.error(f"Error while creating order: {responce}")
             raise ConnectionError(f"Ошибка при создании ордера: {responce}")
+
+    async def _find_order(self, order_link_id: str) -> dict | None:
+        """
+        Функция ищет ордер по orderLinkId и возвращает его в формате ответа на создание ордера,
+        возвращает None, если такого ордера нет.
+        order/realtime по умолчанию (openOnly=0) возвращает только открытые ордера, а рыночный ордер
+        на вход к этому моменту обычно уже исполнен, поэтому затем ищем среди закрытых (openOnly=1).
+        :param order_link_id:
+        :return:
+        """
+        orders: list[dict] = []
+        for open_only in (0, 1):
+            response: dict = await self.bybit.get_open_orders(
+                category=self.category,
+                symbol=self.symbol,
+                orderLinkId=order_link_id,
+                openOnly=open_only)
+            orders = response.get("result", {}).get("list", [])
+            if orders:
+                break
+        else:
+            return None
+
+        return {
+            "retCode": 0,
+            "retMsg": "OK",
+            "result": {"orderId": orders[0]["orderId"], "orderLinkId": orders[0]["orderLinkId"]},
+        }
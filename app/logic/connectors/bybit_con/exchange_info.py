@@ -1,7 +1,6 @@
 __all__ = ["exchange_info", ]
 
 import re
-import time
 
 import requests
 
@@ -83,7 +82,15 @@ class ExchangeInfo(ABCExchangeInfo):
 
             except Exception as error:
                 logger.error(f"{type(error)} in _update_data in symbols_decimals worker: {error}.")
-            time.sleep(60 * 60)
+            cls._sleep(60 * 60)
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        """
+        Check that symbols data is loaded
+        :return:
+        """
+        return bool(cls.symbols_data)
 
     @classmethod
     def round_price(cls, symbol: str, price: float) -> float:
@@ -0,0 +1,94 @@
+import hashlib
+import hmac
+import time
+from typing import Any, Callable
+
+import orjson
+from websockets import WebSocketClientProtocol
+
+from ..abstract import ABCTradeWebSocket
+
+
+class BybitTradeWebSocket(ABCTradeWebSocket):
+    """
+    Торговое вебсокет соединение bybit.com (v5 /trade).
+    Через вебсокет поддерживаются только операции с отдельными ордерами (order.create, order.amend,
+    order.cancel), поэтому отмена всех ордеров и стоп/тейк позиции остаются в REST.
+    Ответы приводятся к формату REST ответов, чтобы вызывающий код не зависел от транспорта.
+    """
+    url: str = "wss://stream.bybit.com/v5/trade"
+    ping_interval: float = 20
+
+    RECV_WINDOW: int = 5000
+    AUTH_EXPIRES_MS: int = 10_000
+
+    def __init__(
+            self,
+            api_key: str,
+            api_secret: str,
+            timestamp_offset: Callable[[], float],
+            request_timeout: float
+    ) -> None:
+        """
+        :param api_key:
+        :param api_secret:
+        :param timestamp_offset: Функция, которая возвращает смещение времени биржи в миллисекундах.
+        :param request_timeout: Сколько секунд ждать ответ на запрос.
+        """
+        super().__init__(name="bybit.com")
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._timestamp_offset = timestamp_offset
+        self._request_timeout = request_timeout
+
+    async def place_order(self, **kwargs) -> dict:
+        return self._to_rest_response(await self.request("order.create", [kwargs], self._request_timeout))
+
+    async def amend_order(self, **kwargs) -> dict:
+        return self._to_rest_response(await self.request("order.amend", [kwargs], self._request_timeout))
+
+    async def cancel_order(self, **kwargs) -> dict:
+        return self._to_rest_response(await self.request("order.cancel", [kwargs], self._request_timeout))
+
+    def _timestamp(self) -> int:
+        return int(time.time() * 1000 + self._timestamp_offset())
+
+    async def _authenticate(self, ws: WebSocketClientProtocol) -> None:
+        expires: int = self._timestamp() + self.AUTH_EXPIRES_MS
+        signature: str = hmac.new(
+            self._api_secret.encode("utf-8"), f"GET/realtime{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+        await ws.send(orjson.dumps({"op": "auth", "args": [self._api_key, expires, signature]}).decode())
+
+        response: dict = orjson.loads(await ws.recv())
+        if response.get("retCode") != 0:
+            raise ConnectionError(f"bybit.com trade ws auth failed: {response}")
+
+    def _build_request(self, request_id: str, op: str, args: Any) -> dict:
+        return {
+            "reqId": request_id,
+            "header": {
+                "X-BAPI-TIMESTAMP": str(self._timestamp()),
+                "X-BAPI-RECV-WINDOW": str(self.RECV_WINDOW),
+            },
+            "op": op,
+            "args": args,
+        }
+
+    def _get_request_id(self, message: dict) -> str | None:
+        return message.get("reqId")
+
+    @staticmethod
+    def _to_rest_response(message: dict) -> dict:
+        """
+        Функция приводит ответ вебсокета к формату REST ответа:
+        {'retCode': 0, 'retMsg': 'OK', 'result': {'orderId': '...', 'orderLinkId': '...'}, 'retExtInfo': {}, 'time': ...}
+        :param message:
+        :return:
+        """
+        return {
+            "retCode": message.get("retCode"),
+            "retMsg": message.get("retMsg"),
+            "result": message.get("data", {}),
+            "retExtInfo": message.get("retExtInfo", {}),
+            "time": message.get("header", {}).get("Timenow"),
+        }
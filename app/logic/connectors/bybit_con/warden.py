@@ -3,17 +3,20 @@ import asyncio
 import httpx
 
 from app.config import WARDEN_TIMEOUT, logger
-from app.database import SecretsORM, Database
-from app.logic.utils import AlertWorker
+from app.database import SecretsORM, Database, Exchange
+from app.logic.utils import AlertWorker, ClientPool, CircuitBreakers, CircuitOpenError
 from .client import AsyncClient
+from .exchange import Bybit
 from ..abstract import ABCPositionWarden
 
 
 class BybitWarden(ABCPositionWarden):
     category: str = "linear"
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, clients: ClientPool, breakers: CircuitBreakers):
         self._db = db
+        self._clients = clients
+        self._breakers = breakers
         self._client: AsyncClient | None = None
 
     async def start_warden(self) -> None:
@@ -25,36 +28,37 @@ class BybitWarden(ABCPositionWarden):
         prev_iteration_positions: list[dict] = []
 
         while True:
-            secrets: SecretsORM = await self._db.secrets_repo.get()
+            secrets: SecretsORM = self._db.secrets_repo.snapshot
             if all([secrets.bybit_api_key, secrets.bybit_api_secret]):
                 try:
-                    if self._client:
-                        await self._client.close_connection()
-                    self._client: AsyncClient = await AsyncClient.create(
-                        api_key=secrets.bybit_api_key,
-                        api_secret=secrets.bybit_api_secret)
-
-                    # Получаем все открытые позиции
-                    positions: list[dict] = await self._get_open_positions()
-
-                    # Находим позиции без стопов
-                    positions_wo_stop: list[dict] = self._get_positions_wo_stop(positions)
-                    if positions_wo_stop:
-                        logger.info(f"Find positions w/o stop: {positions_wo_stop}")
-
-                    # Находим одинаковые элементы в двух последних итерациях
-                    positions_to_close = self._find_common_elements(
-                        prev_iteration=prev_iteration_positions,
-                        curr_iteration=positions_wo_stop)
-                    if positions_to_close:
-                        logger.warning(f"I should close positions: {positions_to_close}")
-
-                    # Обновляем историю найденных позиций
-                    prev_iteration_positions = positions_wo_stop
-
-                    # Заркываем позиции
-                    await self._close_positions(positions_to_close=positions_to_close)
-
+                    # Пока биржа отключена предохранителем, проверка пропускается
+                    async with self._breakers.get(Exchange.BYBIT, secrets.bybit_api_key).guard(Bybit.transport_errors):
+                        self._client: AsyncClient = await self._clients.get(
+                            Exchange.BYBIT, secrets.bybit_api_key, secrets.bybit_api_secret)
+
+                        # Получаем все открытые позиции
+                        positions: list[dict] = await self._get_open_positions()
+
+                        # Находим позиции без стопов
+                        positions_wo_stop: list[dict] = self._get_positions_wo_stop(positions)
+                        if positions_wo_stop:
+                            logger.info(f"Find positions w/o stop: {positions_wo_stop}")
+
+                        # Находим одинаковые элементы в двух последних итерациях
+                        positions_to_close = self._find_common_elements(
+                            prev_iteration=prev_iteration_positions,
+                            curr_iteration=positions_wo_stop)
+                        if positions_to_close:
+                            logger.warning(f"I should close positions: {positions_to_close}")
+
+                        # Обновляем историю найденных позиций
+                        prev_iteration_positions = positions_wo_stop
+
+                        # Заркываем позиции
+                        await self._close_positions(positions_to_close=positions_to_close)
+
+                except CircuitOpenError as e:
+                    logger.info(f"Skip bybit warden iteration: {e}")
                 except httpx.ConnectTimeout as e:
                     logger.error(f"Error in bybit warden: ConnectTimeout: {e}")
                 except Exception as e:
@@ -3,12 +3,36 @@ import base64
 import hmac
 import json
 from datetime import datetime
-from typing import Optional, Union, Dict, Any, Literal
+from typing import Optional, Union, Dict, Any, Literal, Callable, Awaitable
 from urllib.parse import urlencode
 
 import aiohttp
 
 from app.config import logger
+from .trade_ws import OKXTradeWebSocket
+from ..abstract import TradeWebSocketUnavailable
+
+
+# Сколько секунд держать неиспользуемое соединение открытым
+KEEPALIVE_TIMEOUT: float = 60
+
+# Таймаут одного запроса в секундах
+REQUEST_TIMEOUT: float = 5
+
+
+class OKXAPIError(ConnectionError):
+    """
+    The error returned by the OKX API.
+
+    Attributes:
+        code (str): the error code, e.g. "51603" (order does not exist).
+
+    """
+
+    def __init__(self, response: Dict[str, Any]) -> None:
+        super().__init__(f"{response}")
+        self.code: str = str(response.get('code'))
+        self.response = response
 
 
 class BaseClient:
@@ -31,6 +55,31 @@ class BaseClient:
         self.__passphrase = passphrase
         self.__retries = retries
 
+        # Одна сессия на клиент, чтобы не открывать новое соединение на каждый запрос
+        self.__session: aiohttp.ClientSession | None = None
+
+    async def close_connection(self) -> None:
+        """
+        Close the client session.
+
+        """
+        if self.__session and not self.__session.closed:
+            await self.__session.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the client session, create it if it doesn't exist yet.
+
+        Returns:
+            aiohttp.ClientSession: the client session.
+
+        """
+        if self.__session is None or self.__session.closed:
+            self.__session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                connector=aiohttp.TCPConnector(keepalive_timeout=KEEPALIVE_TIMEOUT))
+        return self.__session
+
     @staticmethod
     async def get_timestamp() -> str:
         """
@@ -98,35 +147,94 @@ class BaseClient:
             'OK-ACCESS-PASSPHRASE': self.__passphrase
         }
 
-        for _ in range(self.__retries):
+        # POST запросы не повторяются: повтор может создать второй ордер. Ордера повторяются
+        # выше по коду через place_idempotent, после проверки по clOrdId
+        retries: int = self.__retries if method == "GET" else 1
+        for attempt in range(1, retries + 1):
             try:
-                timeout = aiohttp.ClientTimeout(total=5)
-
-                async with aiohttp.ClientSession(timeout=timeout) as session:
-                    if method == "POST":
-                        response = await session.post(
-                            url=url,
-                            headers=header,
-                            data=json.dumps(body) if isinstance(body, dict) else body
-                        )
-                    else:
-                        response = await session.get(url=url, headers=header)
-
+                session: aiohttp.ClientSession = self._get_session()
+                if method == "POST":
+                    response = await session.post(
+                        url=url,
+                        headers=header,
+                        data=json.dumps(body) if isinstance(body, dict) else body
+                    )
+                else:
+                    response = await session.get(url=url, headers=header)
+
+                async with response:
                     response = await response.json()
 
                 if int(response.get('code')):
-                    raise ConnectionError(f"{response}")
+                    raise OKXAPIError(response)
 
                 return response
             except asyncio.TimeoutError:
                 logger.error("OKX.com TimeoutError")
-                continue
+                if attempt == retries:
+                    raise
 
 
 class AsyncClient(BaseClient):
 
-    def __init__(self, api_key: str, secret_key: str, passphrase: str, retries: Optional[int] = 3) -> None:
+    def __init__(
+            self,
+            api_key: str,
+            secret_key: str,
+            passphrase: str,
+            retries: Optional[int] = 3,
+            trade_ws: bool = False
+    ) -> None:
+        """
+        Initialize the client.
+
+        Args:
+            trade_ws (bool): send orders through the private websocket, REST is used as a fallback. (False)
+
+        """
         super().__init__(api_key, secret_key, passphrase, retries)
+        self.trade_ws: OKXTradeWebSocket | None = OKXTradeWebSocket(
+            api_key=api_key,
+            secret_key=secret_key,
+            passphrase=passphrase,
+            request_timeout=REQUEST_TIMEOUT,
+        ) if trade_ws else None
+
+    async def close_connection(self) -> None:
+        """
+        Close the client session and the private websocket.
+
+        """
+        if self.trade_ws:
+            await self.trade_ws.close()
+        await super().close_connection()
+
+    async def _send_trade_request(
+            self,
+            ws_request: Callable[[], Awaitable[Dict[str, Any]]],
+            rest_request: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Send the request through the private websocket if it is connected, otherwise through REST.
+
+        Args:
+            ws_request: the websocket request.
+            rest_request: the REST request.
+
+        Returns:
+            Optional[Dict[str, Any]]: the request response in the REST format.
+
+        """
+        if self.trade_ws:
+            try:
+                response = await ws_request()
+            except TradeWebSocketUnavailable:
+                pass
+            else:
+                if int(response.get('code')):
+                    raise OKXAPIError(response)
+                return response
+        return await rest_request()
 
     async def _post(self, request_path: str, body: Optional[dict] | str = None) -> Optional[Dict[str, Any]]:
         return await self.make_request("POST", request_path, body)
@@ -134,6 +242,9 @@ class AsyncClient(BaseClient):
     async def _get(self, request_path: str, body: Optional[dict] | str = None) -> Optional[Dict[str, Any]]:
         return await self.make_request("GET", request_path, body)
 
+    async def get_system_time(self) -> Optional[Dict[str, Any]]:
+        return await self._get("/api/v5/public/time")
+
     async def get_account_config(self):
         return await self._get("/api/v5/account/config")
 
@@ -155,9 +266,10 @@ class AsyncClient(BaseClient):
         if orders:
             ids: list[str] = [o["ordId"] for o in orders]
             orders_with_ids: list[dict] = [{"instId": instId, "ordId": _id} for _id in ids]
-            orders_with_ids: str = json.dumps(orders_with_ids)
 
-            return await self._post("/api/v5/trade/cancel-batch-orders", body=orders_with_ids)
+            return await self._send_trade_request(
+                ws_request=lambda: self.trade_ws.cancel_orders(orders_with_ids),
+                rest_request=lambda: self._post("/api/v5/trade/cancel-batch-orders", body=json.dumps(orders_with_ids)))
         else:
             return {}
 
@@ -184,7 +296,28 @@ class AsyncClient(BaseClient):
         return await self._get("/api/v5/trade/orders-pending", body=body)
 
     async def place_order(self, body: dict[str, Any]) -> Optional[Dict[str, Any]]:
-        return await self._post("/api/v5/trade/order", body=json.dumps(body))
+        return await self._send_trade_request(
+            ws_request=lambda: self.trade_ws.place_order(body),
+            rest_request=lambda: self._post("/api/v5/trade/order", body=json.dumps(body)))
+
+    async def place_batch_orders(self, orders: list[dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        https://www.okx.com/docs-v5/en/#order-book-trading-trade-post-place-multiple-orders
+        :param orders:
+        :return:
+        """
+        return await self._send_trade_request(
+            ws_request=lambda: self.trade_ws.place_batch_orders(orders),
+            rest_request=lambda: self._post("/api/v5/trade/batch-orders", body=json.dumps(orders)))
+
+    async def get_order(self, instId: str, clOrdId: str) -> Optional[Dict[str, Any]]:  # noqa
+        """
+        https://www.okx.com/docs-v5/en/#order-book-trading-trade-get-order-details
+        :param instId:
+        :param clOrdId:
+        :return:
+        """
+        return await self._get("/api/v5/trade/order", body=dict(instId=instId, clOrdId=clOrdId))
 
     async def get_open_algo_orders(self, ordType: str = "conditional") -> Optional[Dict[str, Any]]:  # noqa
         """
@@ -199,3 +332,11 @@ class AsyncClient(BaseClient):
 
     async def place_algo_order(self, body: dict) -> Optional[Dict[str, Any]]:
         return await self._post("/api/v5/trade/order-algo", body=body)
+
+    async def get_algo_order(self, algoClOrdId: str) -> Optional[Dict[str, Any]]:  # noqa
+        """
+        https://www.okx.com/docs-v5/en/#order-book-trading-algo-trading-get-algo-order-details
+        :param algoClOrdId:
+        :return:
+        """
+        return await self._get("/api/v5/trade/order-algo", body=dict(algoClOrdId=algoClOrdId))
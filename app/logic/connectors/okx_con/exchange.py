@@ -1,13 +1,22 @@
-from app.config import logger, BREAKEVEN_STEP_PERCENT
+from typing import Awaitable
+
+import aiohttp
+
+from app.config import logger, BREAKEVEN_STEP_PERCENT, OKX_ORDER_TRANSPORT
+from app.database import Exchange
 from .breakeven import OKXBreakevenWebSocket
-from .client import AsyncClient
+from .client import AsyncClient, OKXAPIError
 from .exchange_info import exchange_info
 from ..abstract import ABCExchange
-from ...schemas import BreakevenType, BreakevenTask
-from ...utils import AlertWorker
+from ...schemas import BreakevenType
+from ...utils import AlertWorker, Metrics, make_client_order_id, place_idempotent
 
 
 class OKX(ABCExchange):
+    exchange = Exchange.OKX
+    info = exchange_info
+    breakeven_websocket = OKXBreakevenWebSocket
+    transport_errors = ABCExchange.transport_errors + (aiohttp.ClientError,)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -16,67 +25,40 @@ class OKX(ABCExchange):
 
         self.okx: AsyncClient | None = None
 
-    async def _init_client(self) -> None:
+    @staticmethod
+    async def create_client(api_key: str, api_secret: str, api_pass: str | None) -> AsyncClient:
         """
-        Функция инициализирует клиент биржи.
+        Функция создает клиент биржи.
         :return:
         """
-        self.okx = AsyncClient(api_key=self._api_key, secret_key=self._api_secret, passphrase=self._api_pass)
-
-    async def process_signal(self) -> bool:
+        client: AsyncClient = AsyncClient(
+            api_key=api_key, secret_key=api_secret, passphrase=api_pass, trade_ws=OKX_ORDER_TRANSPORT == "ws")
+        if client.trade_ws:
+            client.trade_ws.start()
+        return client
+
+    @staticmethod
+    async def warm_up(client: AsyncClient) -> None:
         """
-        Функция обрабатывает сигнал и создает ордера на бирже.
-        При успешном исполнении ордеров возвращается True, при неуспешном - False
+        Функция делает публичный запрос времени сервера, чтобы открыть соединение.
+        Подпись okx.com использует локальное время, поэтому смещение не сохраняется.
         :return:
         """
-        try:
-            # Инициализация клиента для работы с биржей
-            await self._init_client()
-
-            # Проверка на то, есть ли уже открытая позицичя по тикеру
-            if not await self._is_available_to_open_position():
-                return False
-
-            # Отправляем лог, что начинается обработка стратегии
-            await AlertWorker.warning(f"Запуск стратегии {self._signal.strategy}")
-
-            # Отменяем все старые ордера, которые были на монете
-            await self.okx.cancel_all_open_orders(instId=self.symbol)
-
-            # Определяем сторону позиции
-            self._define_position_side()
-
-            # Определяем последнюю цену тикера
-            await self._define_ticker_last_price()
-
-            # Определеяем размер позиции исходя из рисков юзера
-            self._define_position_quantity()
-
-            # Открываем маркет ордер
-            await self._create_market_order()
-
-        except Exception as e:
-            logger.exception(f"Error while process signal: {e}")
-            await AlertWorker.send(f"Ошибка при обработке сигнала по {self.symbol}: {e}")
-            return False
-
-        else:
-            await OKXBreakevenWebSocket(
-                task=BreakevenTask(
-                    ticker=self.symbol,
-                    stop_loss=self._signal.stop_loss,
-                    take_profit=self._signal.take_profit,
-                    plus_breakeven=self._signal.plus_breakeven,
-                    minus_breakeven=self._signal.minus_breakeven,
-                    callback=self._handle_breakeven_event
-                ),
-            ).run()
+        await client.get_system_time()
 
-            return True
+    async def _init_client(self) -> None:
+        """
+        Функция берет клиент биржи из пула клиентов.
+        :return:
+        """
+        self.okx = await self._clients.get(self.exchange, self._api_key, self._api_secret, self._api_pass)
 
     async def _handle_breakeven_event(self, be_type: BreakevenType) -> None:
         """ Функция принимает каллбек для события, когда нужно переставить безубыток. """
         try:
+            # Клиент мог быть пересоздан в пуле, если за время жизни позиции изменились ключи
+            await self._init_client()
+
             await AlertWorker.warning(f"Пытаюсь переставить безубыток на стратегии {self._signal.strategy}. "
                                       f"Дождитесь сообщения об успешном создании ордера.")
 
@@ -110,6 +92,7 @@ class OKX(ABCExchange):
                 reduceOnly=True,
                 ordType="conditional",  # or 'oco' idk
                 closeFraction="1",  # maybe it will not work becouse it was already placed 1 sl/tp order,
+                algoClOrdId=make_client_order_id(self._signal, f"breakeven_{be_type.value.lower()}"),
             )
 
             if be_type == BreakevenType.PLUS:
@@ -123,7 +106,10 @@ class OKX(ABCExchange):
                 body["tpTriggerPx"] = be_price
                 body["tpOrdPx"] = -1
 
-            responce: dict = await self.okx.place_algo_order(body=body)
+            responce: dict = await place_idempotent(
+                place=lambda: self.okx.place_algo_order(body=body),
+                lookup=lambda: self._find_order(self.okx.get_algo_order(algoClOrdId=body["algoClOrdId"])),
+                errors=self.transport_errors)
 
             if responce.get("code") != "0":
                 logger.exception(f"Error while opening order on okx.com: {responce}")
@@ -164,6 +150,13 @@ class OKX(ABCExchange):
         else:
             raise ValueError("Can not define position side")
 
+    async def _cancel_all_orders(self) -> None:
+        """
+        Функция отменяет все старые ордера, которые были на монете.
+        :return:
+        """
+        await self.okx.cancel_all_open_orders(instId=self.symbol)
+
     async def _define_ticker_last_price(self) -> None:
         """
         Функция получает и возвращает последнюю цену монеты для определения размера позиции.
@@ -185,7 +178,7 @@ class OKX(ABCExchange):
             raise ValueError("Wrong position side")
         self.quantity = self._user_strategy.risk_usdt / (percents_to_stop * self.last_price)
 
-    async def _create_market_order(self) -> dict:
+    async def _create_entry_order(self) -> dict:
         """
         Функция создает рыночный ордер.
 
@@ -199,6 +192,7 @@ class OKX(ABCExchange):
             tdMode="cross",
             posSide="net",
             sz=abs(exchange_info.round_quantity(symbol=self.symbol, quantity=self.quantity)),
+            clOrdId=make_client_order_id(self._signal, "entry"),
             attachAlgoOrds=[
                 dict(
                     tpOrdKind="condition",
@@ -213,7 +207,12 @@ class OKX(ABCExchange):
             ]
         )
 
-        responce: dict = await self.okx.place_order(body)
+        # При таймауте ордер ищется по clOrdId и отправляется повторно, только если его нет
+        with Metrics.measure("order_ack"):
+            responce: dict = await place_idempotent(
+                place=lambda: self.okx.place_order(body),
+                lookup=lambda: self._find_order(self.okx.get_order(instId=self.symbol, clOrdId=body["clOrdId"])),
+                errors=self.transport_errors)
 
         if responce.get("code") != "0":
             raise Exception(f"Error while opening order on okx.com: {responce}")
@@ -222,3 +221,17 @@ class OKX(ABCExchange):
                                       f"{body['sz']} в сторону {body['side']}")
         return responce
 
+    @staticmethod
+    async def _find_order(request: Awaitable[dict]) -> dict | None:
+        """
+        Функция выполняет запрос ордера по айди и возвращает ответ, если ордер найден, иначе None.
+        :param request: Запрос ордера (get_order или get_algo_order).
+        :return:
+        """
+        try:
+            return await request
+        except OKXAPIError as e:
+            # 51603: Order does not exist
+            if e.code == "51603":
+                return None
+            raise
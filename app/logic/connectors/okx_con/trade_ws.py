@@ -0,0 +1,67 @@
+import base64
+import hmac
+import time
+from typing import Any
+
+import orjson
+from websockets import WebSocketClientProtocol
+
+from ..abstract import ABCTradeWebSocket
+
+
+class OKXTradeWebSocket(ABCTradeWebSocket):
+    """
+    Приватное вебсокет соединение okx.com для торговых операций: order, batch-orders и batch-cancel-orders.
+    Алго ордера (стоп и тейк для безубытка) через вебсокет не отправляются, они остаются в REST.
+    Ответы имеют тот же формат, что и REST ответы: {"code": "0", "msg": "", "data": [...]}.
+    """
+    url: str = "wss://ws.okx.com:8443/ws/v5/private"
+    ping_interval: float = 20
+
+    def __init__(self, api_key: str, secret_key: str, passphrase: str, request_timeout: float) -> None:
+        """
+        :param api_key:
+        :param secret_key:
+        :param passphrase:
+        :param request_timeout: Сколько секунд ждать ответ на запрос.
+        """
+        super().__init__(name="okx.com")
+        self._api_key = api_key
+        self._secret_key = secret_key
+        self._passphrase = passphrase
+        self._request_timeout = request_timeout
+
+    async def place_order(self, body: dict[str, Any]) -> dict:
+        return await self.request("order", [body], self._request_timeout)
+
+    async def place_batch_orders(self, orders: list[dict]) -> dict:
+        return await self.request("batch-orders", orders, self._request_timeout)
+
+    async def cancel_orders(self, orders: list[dict]) -> dict:
+        return await self.request("batch-cancel-orders", orders, self._request_timeout)
+
+    async def _authenticate(self, ws: WebSocketClientProtocol) -> None:
+        timestamp: str = str(int(time.time()))
+        sign: str = base64.b64encode(hmac.new(
+            self._secret_key.encode("utf-8"),
+            f"{timestamp}GET/users/self/verify".encode("utf-8"),
+            digestmod="sha256").digest()).decode()
+        await ws.send(orjson.dumps({"op": "login", "args": [{
+            "apiKey": self._api_key,
+            "passphrase": self._passphrase,
+            "timestamp": timestamp,
+            "sign": sign,
+        }]}).decode())
+
+        response: dict = orjson.loads(await ws.recv())
+        if response.get("event") != "login" or response.get("code") != "0":
+            raise ConnectionError(f"okx.com trade ws login failed: {response}")
+
+    def _build_request(self, request_id: str, op: str, args: Any) -> dict:
+        return {"id": request_id, "op": op, "args": args}
+
+    def _get_request_id(self, message: dict) -> str | None:
+        return message.get("id")
+
+    def _ping_message(self) -> str:
+        return "ping"
@@ -1,16 +1,19 @@
 import asyncio
 
 from app.config import logger, WARDEN_TIMEOUT
-from app.database import SecretsORM, Database
+from app.database import SecretsORM, Database, Exchange
 from .client import AsyncClient
+from .exchange import OKX
 from ..abstract import ABCPositionWarden
-from ...utils import AlertWorker
+from ...utils import AlertWorker, ClientPool, CircuitBreakers, CircuitOpenError
 
 
 class OKXWarden(ABCPositionWarden):
 
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, clients: ClientPool, breakers: CircuitBreakers):
         self._db = db
+        self._clients = clients
+        self._breakers = breakers
         self._client: AsyncClient | None = None
 
     async def start_warden(self) -> None:
@@ -22,46 +25,47 @@ class OKXWarden(ABCPositionWarden):
         prev_iteration_positions: list[dict] = []
 
         while True:
-            secrets: SecretsORM = await self._db.secrets_repo.get()
+            secrets: SecretsORM = self._db.secrets_repo.snapshot
             if all([secrets.okx_api_key, secrets.okx_api_secret, secrets.okx_api_pass]):
                 try:
-                    # Инициализируем клиент
-                    self._client = AsyncClient(
-                        api_key=secrets.okx_api_key,
-                        secret_key=secrets.okx_api_secret,
-                        passphrase=secrets.okx_api_pass
-                    )
-
-                    # Получаем все открытые позиции и открытые ордера
-                    # positions: dict = await client.get_open_positions(instType="SWAP")
-                    positions: dict = await self._client.get_account_positions_risk(instType="SWAP")
-                    positions: list[dict] = positions["data"][0]["posData"]
-                    oco_orders: dict = await self._client.get_open_algo_orders(ordType="oco")
-                    oco_orders: list[dict] = oco_orders["data"]
-                    cond_orders: dict = await self._client.get_open_algo_orders(ordType="conditional")
-                    cond_orders: list[dict] = cond_orders["data"]
-                    orders: list[dict] = cond_orders + oco_orders
-
-                    # Получаем позиции, которые нужно закрыть
-                    curr_iteration_positions: list[dict] = self._check_positions_health(
-                        orders=orders,
-                        positions=positions)
-                    if curr_iteration_positions:
-                        logger.info(f"Find positions to w/o stop: {curr_iteration_positions}")
-
-                    # Находим одинаковые элементы в последних итерациях
-                    positions_to_close: list[dict] = self._find_common_elements(
-                        prev_iteration=prev_iteration_positions,
-                        curr_iteration=curr_iteration_positions)
-                    if positions_to_close:
-                        logger.warning(f"I should close positions: {positions_to_close}")
-
-                    # Обновляем историю найденных позиций
-                    prev_iteration_positions = curr_iteration_positions
-
-                    # Закрываем позиции
-                    await self._close_positions(positions_to_close)
-
+                    # Пока биржа отключена предохранителем, проверка пропускается
+                    async with self._breakers.get(Exchange.OKX, secrets.okx_api_key).guard(OKX.transport_errors):
+                        # Берем клиент из пула клиентов
+                        self._client: AsyncClient = await self._clients.get(
+                            Exchange.OKX, secrets.okx_api_key, secrets.okx_api_secret, secrets.okx_api_pass)
+
+                        # Получаем все открытые позиции и открытые ордера
+                        # positions: dict = await client.get_open_positions(instType="SWAP")
+                        positions: dict = await self._client.get_account_positions_risk(instType="SWAP")
+                        positions: list[dict] = positions["data"][0]["posData"]
+                        oco_orders: dict = await self._client.get_open_algo_orders(ordType="oco")
+                        oco_orders: list[dict] = oco_orders["data"]
+                        cond_orders: dict = await self._client.get_open_algo_orders(ordType="conditional")
+                        cond_orders: list[dict] = cond_orders["data"]
+                        orders: list[dict] = cond_orders + oco_orders
+
+                        # Получаем позиции, которые нужно закрыть
+                        curr_iteration_positions: list[dict] = self._check_positions_health(
+                            orders=orders,
+                            positions=positions)
+                        if curr_iteration_positions:
+                            logger.info(f"Find positions to w/o stop: {curr_iteration_positions}")
+
+                        # Находим одинаковые элементы в последних итерациях
+                        positions_to_close: list[dict] = self._find_common_elements(
+                            prev_iteration=prev_iteration_positions,
+                            curr_iteration=curr_iteration_positions)
+                        if positions_to_close:
+                            logger.warning(f"I should close positions: {positions_to_close}")
+
+                        # Обновляем историю найденных позиций
+                        prev_iteration_positions = curr_iteration_positions
+
+                        # Закрываем позиции
+                        await self._close_positions(positions_to_close)
+
+                except CircuitOpenError as e:
+                    logger.info(f"Skip okx warden iteration: {e}")
                 except Exception as e:
                     logger.exception(f"Error in okx warden: {e}")
             else:
@@ -1,15 +1,19 @@
 import asyncio
-import json
+import time
 from datetime import datetime
-
-import aiohttp
-import websockets
-
-from app.config import logger, log_args, VERSION, WS_RECONNECT_TIMEOUT, WS_WORKERS_COUNT
+from typing import Coroutine
+
+from app.config import logger, log_args, VERSION, WS_SHARDS_COUNT, WS_WORKER_IDLE_TIMEOUT, WS_SEEN_SIGNALS_LIMIT, \
+    WS_DEDUPLICATION_WINDOW, WS_MASTER_CONNECTIONS_COUNT, WS_MASTER_EXTRA_HOSTS, SIGNAL_MAX_AGE, SIGNAL_QUEUE_MAXSIZE, \
+    SIGNAL_QUEUE_OVERFLOW, SIGNAL_COLLAPSE_WINDOW, WS_TELEMETRY_INTERVAL, MASTER_API_CACHE_TTL, MASTER_API_TIMEOUT, \
+    SIGNAL_COALESCE_POLICY, SIGNAL_COALESCE_WINDOW, EXCHANGE_KEEP_WARM_INTERVAL, EXCHANGE_INFO_READY_TIMEOUT, \
+    SIGNAL_EXECUTION_BUDGET, SIGNAL_STAGE_TIMEOUTS, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RECOVERY_TIMEOUT, \
+    CIRCUIT_SLOW_CALL_THRESHOLD
 from app.database import Database, SecretsORM, Exchange
 from .connectors import EXCHANGES_CLASSES_FROM_ENUM, BinanceWarden, BybitWarden, ABCExchange, OKXWarden
-from .schemas import UserStrategySettings, Signal, SignalDict
-from .utils import AlertWorker
+from .schemas import UserStrategySettings, Signal
+from .utils import AlertWorker, SignalDispatcher, SignalDecoder, SignalDecodeError, MasterConnection, \
+    SignalDeduplicator, ClockSync, Metrics, SignalQueue, MasterAPI, ClientPool, Deadline, CircuitBreakers
 
 
 class Logic:
@@ -19,22 +23,81 @@ class Logic:
     """
 
     def __init__(self, secrets: SecretsORM, db: Database) -> None:
-        # Обьект базы данных для обновления секретных данных
+        # Обьект базы данных, секретные данные читаются из его снимка в памяти
         self._db = db
-        self._secrets = secrets
 
         # Ключ лицензии, хост и порт для составления url запросов
         self._license_key: str = secrets.license_key
         _, self._host, self._port = self._parse_license_key()
 
-        # Очередь сообщений с вебсокета.
-        self._queue: asyncio.Queue = asyncio.Queue()
+        # REST запросы к главному серверу через общую сессию с кешем ответов
+        self._master_api: MasterAPI = MasterAPI(
+            base_url=f"http://{self._host}:{self._port}",
+            license_key=self._license_key,
+            ttl=MASTER_API_CACHE_TTL,
+            timeout=MASTER_API_TIMEOUT)
+
+        # Распределитель сигналов с вебсокета по шардам (биржа, тикер).
+        # В очереди шарда сигналы активных стратегий идут раньше сигналов, нужных только для алертов.
+        self._dispatcher: SignalDispatcher = SignalDispatcher(
+            handler=self._handle_signal,
+            shards_count=WS_SHARDS_COUNT,
+            idle_timeout=WS_WORKER_IDLE_TIMEOUT,
+            queue_factory=lambda: SignalQueue(
+                maxsize=SIGNAL_QUEUE_MAXSIZE,
+                priority=self._get_signal_priority,
+                collapse_key=lambda signal: (signal.strategy, signal.ticker),
+                collapse_window=SIGNAL_COLLAPSE_WINDOW,
+                overflow=SIGNAL_QUEUE_OVERFLOW))
+
+        # Оценка смещения локальных часов относительно часов мастера, общая для всех соединений
+        self._clock: ClockSync = ClockSync()
+
+        # Соединения с мастер вебсокетом: несколько сокетов к хосту из ключа лицензии
+        # и по одному к каждому дополнительному хосту. Сигнал исполняется по первой пришедшей копии.
+        hosts: list[str] = [f"{self._host}:{self._port}"] * WS_MASTER_CONNECTIONS_COUNT + WS_MASTER_EXTRA_HOSTS
+        self._masters: list[MasterConnection] = [
+            MasterConnection(
+                url=f"ws://{host}/ws/{VERSION}/{self._license_key}",
+                name=f"master#{i}",
+                clock=self._clock,
+                on_message=self._dispatch_message,
+                on_connect=self._on_master_connect)
+            for i, host in enumerate(hosts)
+        ]
+
+        # Отсеивает копии сигналов, пришедшие по другим соединениям или повторно после переподключения
+        self._deduplicator: SignalDeduplicator = SignalDeduplicator(
+            ids_limit=WS_SEEN_SIGNALS_LIMIT,
+            window=WS_DEDUPLICATION_WINDOW)
+
+        # Список стратегий и время истечения лицензии, которые присылает мастер по вебсокету.
+        # Пока есть соединение с мастером, проверки делаются по ним без запросов к серверу.
+        self._catalog: set[str] | None = None
+        self._license_expired_at: float | None = None
+        self._license_timer: asyncio.TimerHandle | None = None
+
+        # Долгоживущие клиенты бирж, общие для сигналов, безубытков и проверки позиций
+        self._clients: ClientPool = ClientPool(factories={
+            exchange: exchange_class.create_client for exchange, exchange_class in EXCHANGES_CLASSES_FROM_ENUM.items()
+        })
+
+        # Предохранители бирж, общие для сигналов, проверки позиций и поддержания соединения
+        self._breakers: CircuitBreakers = CircuitBreakers(
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout=CIRCUIT_RECOVERY_TIMEOUT,
+            slow_call_threshold=CIRCUIT_SLOW_CALL_THRESHOLD)
 
         # Словарь с активными стратегиями юзера
         self._active_strategies: dict[str, UserStrategySettings] = {}
 
+        # Флаг алертов, с которым была отправлена последняя подписка, и фоновые задачи
+        self._subscribed_alerts: bool | None = None
+        self._background_tasks: set[asyncio.Task] = set()
+        self._db.secrets_repo.subscribe(self._on_secrets_update)
+
         # Инициализируем класс, который отвечает за отправление алертов пользователю
-        AlertWorker.init(secrets=self._secrets)
+        AlertWorker.init(secrets=secrets)
 
     async def start_logic(self) -> None:
         """
@@ -89,24 +152,23 @@ class Logic:
         # while True:
         #     await asyncio.sleep(10000)
 
-        # Создаем задачи для рабочих
-        workers = [asyncio.create_task(self._worker()) for _ in range(WS_WORKERS_COUNT)]
-
         # Создаем задачи для проверки стопов на позициях
         wardens = [
-            asyncio.create_task(BinanceWarden(db=self._db).start_warden()),
-            asyncio.create_task(BybitWarden(db=self._db).start_warden()),
-            asyncio.create_task(OKXWarden(db=self._db).start_warden())
+            asyncio.create_task(BinanceWarden(db=self._db, clients=self._clients, breakers=self._breakers).start_warden()),
+            asyncio.create_task(BybitWarden(db=self._db, clients=self._clients, breakers=self._breakers).start_warden()),
+            asyncio.create_task(OKXWarden(db=self._db, clients=self._clients, breakers=self._breakers).start_warden())
         ]
 
         # Запускаем все что нам нужно для работы программы:
-        # - рабочие
-        # - вебсокет соединение с мастер сервером
+        # - вебсокет соединения с мастер сервером (рабочие шардов запускаются по мере поступления сигналов)
+        # - отправка статистики задержек на мастер
+        # - поддержание соединения с биржей
         # - проверка наличия стопов на позициях
         await asyncio.gather(
-            self._connect_to_master(),
-            *wardens,
-            *workers
+            *[master.run() for master in self._masters],
+            self._telemetry_loop(),
+            self._keep_warm_loop(),
+            *wardens
         )
 
     async def get_license_key_expired_date(self) -> datetime:
@@ -115,19 +177,23 @@ class Logic:
         его в формате datetime.
         :return:
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"http://{self._host}:{self._port}/license_key/{self._license_key}") as responce:
-                result: dict = await responce.json()
-                if result["error"]:
-                    raise Exception(result["error"])
-                return datetime.fromtimestamp(result["result"])
-
-    async def add_user_strategy(self, strategy_name: str, risk_usdt: float, trades_count: int | None) -> None:
+        if self._license_expired_at is not None and self._is_master_connected():
+            return datetime.fromtimestamp(self._license_expired_at)
+        return datetime.fromtimestamp(await self._master_api.get_license_expired_at())
+
+    async def add_user_strategy(
+            self,
+            strategy_name: str,
+            risk_usdt: float,
+            trades_count: int | None,
+            max_signal_age: float | None = None
+    ) -> None:
         """
         Функция добавляет стратегию в словарь активных стратегий.
         :param strategy_name: Название стратегии
         :param risk_usdt: Риск в долларах
         :param trades_count: Количество сделок, если None - то бесконечность.
+        :param max_signal_age: Максимальный возраст сигнала в секундах, если None - то SIGNAL_MAX_AGE.
         :return: None
         """
         # Проверка на то, запущена ли уже стратегния.
@@ -142,9 +208,15 @@ class Logic:
         # Добавление обьекта стратегии в словарь активных стратегий
         self._active_strategies[strategy_name.lower()] = UserStrategySettings(
             risk_usdt=risk_usdt,
-            trades_count=trades_count)
+            trades_count=trades_count,
+            max_signal_age=max_signal_age)
+
+        max_age: str = f" {max_signal_age:g}s" if max_signal_age is not None else ""
+        logger.info(f"Added <'{strategy_name}' {risk_usdt}$ {trades_count}{max_age}> strategy")
+        await self._send_subscription()
 
-        logger.info(f"Added <'{strategy_name}' {risk_usdt}$ {trades_count}> strategy")
+        # Заранее готовим соединение с биржей, чтобы первый сигнал не ждал его установки
+        self._run_in_background(self._pre_arm(alert_on_error=True))
 
     @log_args
     def remove_user_startegy(self, strategy_name: str = "", stop_all: bool = False) -> None:
@@ -161,6 +233,8 @@ class Logic:
                 raise ValueError(f"Стратегия {strategy_name} не существует или не запущена.")
             del self._active_strategies[strategy_name.lower()]
 
+        self._run_in_background(self._send_subscription())
+
     @log_args
     def get_active_user_strategies(self) -> dict[str, UserStrategySettings]:
         """
@@ -169,6 +243,17 @@ class Logic:
         """
         return self._active_strategies
 
+    def get_latency_metrics(self) -> dict[str, dict[str, float]]:
+        """
+        Функция возвращает статистику задержек обработки сигналов:
+        master_latency - от отправки сигнала мастером до получения клиентом (с учетом смещения часов),
+        master_rtt - время ping/pong до мастера,
+        queue_wait - от получения сигнала до начала его обработки рабочим,
+        order_ack - от отправки ордера на биржу до ответа биржи.
+        :return:
+        """
+        return Metrics.summary()
+
     def _parse_license_key(self) -> list[str]:
         """
         Получение хоста и порта, которые содержатся в ключе лицензии.
@@ -176,126 +261,447 @@ class Logic:
         """
         return self._license_key.split(":")
 
-    async def _update_secrets(self) -> None:
+    @property
+    def _secrets(self) -> SecretsORM:
         """
-        Функция обновляет секретные данные.
-        Это нужно например перед тем, как открыть позицию, чтобы иметь актуальные
-        API ключи с бирж.
+        Актуальные секретные данные из снимка в памяти.
+        Снимок обновляется при каждом изменении через secrets_repo.update, поэтому
+        на горячем пути нет обращений к базе данных.
         :return:
         """
-        self._secrets: SecretsORM = await self._db.secrets_repo.get()
+        return self._db.secrets_repo.snapshot
+
+    async def _pre_arm(self, alert_on_error: bool = False) -> None:
+        """
+        Функция готовит выбранную пользователем биржу к исполнению сигнала: создает клиент в пуле
+        (с проверкой ключей), открывает соединение легким запросом, синхронизирует смещение
+        времени и проверяет, что информация об округлении монет загружена.
+        :param alert_on_error: Отправить алерт пользователю, если подготовка не удалась.
+        :return:
+        """
+        try:
+            api_key, api_secret, api_pass, exchange = self._get_keys_and_exchange()
+            exchange_class: type[ABCExchange] = EXCHANGES_CLASSES_FROM_ENUM[exchange]
+
+            # Запрос идет через предохранитель, поэтому после отключения биржи он же служит пробным запросом
+            async with self._breakers.get(exchange, api_key).guard(exchange_class.transport_errors):
+                with Metrics.measure("pre_arm"):
+                    client = await self._clients.get(exchange, api_key, api_secret, api_pass)
+                    await exchange_class.warm_up(client)
+
+            if not exchange_class.info.is_ready():
+                logger.warning(f"Exchange info for {exchange} is not loaded, refresh it")
+                exchange_class.info.refresh()
+                deadline: float = time.monotonic() + EXCHANGE_INFO_READY_TIMEOUT
+                while not exchange_class.info.is_ready():
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"exchange info for {exchange.value} is not loaded")
+                    await asyncio.sleep(0.5)
+        except Exception as e:
+            logger.error(f"Error while pre-arm exchange: {e}")
+            if alert_on_error:
+                await AlertWorker.warning(f"Не удалось подготовить соединение с биржей: {e}")
 
-    async def _connect_to_master(self) -> None:
+    async def _keep_warm_loop(self) -> None:
         """
-        Получаем сообщения с вебсокета с главного сервера.
+        Функция периодически делает легкий запрос к бирже, пока есть активные стратегии,
+        чтобы соединение не закрывалось между редкими сигналами.
         :return:
         """
         while True:
-            try:
-                url: str = f"ws://{self._host}:{self._port}/ws/{VERSION}/{self._license_key}"
-                async with (websockets.connect(url) as ws):  # ws: WebSocketClientProtocol
-                    try:
-                        logger.success(f"WS connected to: {url}")
-                        while True:
-                            msg_str: str = await ws.recv()
-                            logger.info(f"Got message: {msg_str}")
-                            msg_dict: dict = json.loads(msg_str)
-                            await self._queue.put(msg_dict)
-                    except Exception as e:
-                        if isinstance(e, websockets.exceptions.ConnectionClosed):
-                            logger.error(f"WS Connection error in recv ws msg: {e}")
-                        else:
-                            logger.exception(f"WS Unknown error in recv ws msg: {e}")
-                        logger.info(f"Reconnect to WS in {WS_RECONNECT_TIMEOUT} seconds")
-                        await asyncio.sleep(WS_RECONNECT_TIMEOUT)
-                        await ws.close()
-                        continue
-            except Exception as e:
-                _: str = f"WS Fatal ws error: {e}"
-                logger.critical(_)
-                logger.exception(_)
-                await asyncio.sleep(1)
+            await asyncio.sleep(EXCHANGE_KEEP_WARM_INTERVAL)
+            if self._active_strategies:
+                await self._pre_arm()
 
-    async def _worker(self) -> None:
+    def _get_telemetry(self) -> dict:
         """
-        Рабочий, который обрабатывает сообщения из очереди, которые в свою очередь получены
-        с мастер вебсокета.
-        Таких рабочих может быть несколько, чтобы успевать обрабатывать сразу несколько сигналов.
+        Функция составляет компактное сообщение со статистикой задержек клиента для мастера:
+        {"type": "telemetry", "workers": 2, "metrics": {"queue_wait": [count, p50, p95, max], ...}},
+        значения в миллисекундах.
+        :return:
+        """
+        return {
+            "type": "telemetry",
+            "workers": self._dispatcher.workers_count,
+            "metrics": {
+                name: [stats["count"], round(stats["p50"] * 1000), round(stats["p95"] * 1000),
+                       round(stats["max"] * 1000)]
+                for name, stats in Metrics.summary().items()
+            },
+        }
+
+    async def _telemetry_loop(self) -> None:
+        """
+        Функция периодически отправляет статистику задержек в первое подключенное соединение,
+        чтобы оператор мастера видел медленных клиентов.
         :return:
         """
         while True:
+            await asyncio.sleep(WS_TELEMETRY_INTERVAL)
+            for master in self._masters:
+                if not master.is_connected:
+                    continue
+                try:
+                    await master.send(self._get_telemetry())
+                except Exception as e:
+                    logger.error(f"Error while send telemetry on {master.name}: {e}")
+                break
+
+    def _get_subscription(self) -> dict:
+        """
+        Функция составляет сообщение подписки для мастера.
+        Сообщение каждый раз содержит весь список активных стратегий и заменяет предыдущую подписку,
+        поэтому отдельное сообщение для отписки не нужно. Если алерты включены, мастер должен
+        присылать сигналы всех стратегий, потому что алерт отправляется по каждому сигналу.
+        :return:
+        """
+        return {
+            "type": "subscribe",
+            "strategies": sorted(self._active_strategies),
+            "alerts": bool(self._secrets and self._secrets.alerts),
+        }
+
+    async def _send_subscription(self, connection: MasterConnection | None = None) -> None:
+        """
+        Функция отправляет подписку в одно соединение или во все подключенные соединения.
+        Ошибки только логируются: после переподключения подписка отправится заново.
+        :param connection: Соединение, если None - все соединения.
+        :return:
+        """
+        subscription: dict = self._get_subscription()
+        self._subscribed_alerts = subscription["alerts"]
+
+        for master in [connection] if connection else self._masters:
+            if not master.is_connected:
+                continue
             try:
-                # Обновляем данные из базы данных
-                await self._update_secrets()
+                await master.send(subscription)
+            except Exception as e:
+                logger.error(f"Error while send subscription on {master.name}: {e}")
+        logger.debug(f"Subscription sent: {subscription}")
 
-                # Обрабатываем и валидируем сигнал
-                msg: dict = await self._queue.get()
-                signal: Signal = Signal.from_dict(signal_dict=msg)
+    def _run_in_background(self, coro: Coroutine) -> None:
+        """
+        Функция запускает корутину в фоне, для вызова из синхронного кода.
+        Ссылка на задачу хранится до ее завершения, чтобы задачу не удалил сборщик мусора.
+        :param coro: Корутина
+        :return:
+        """
+        task: asyncio.Task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
 
-                # Отсылаем алерт, если нужно
-                if self._secrets.alerts:
-                    await self._send_alert(source=msg)
-                else:
-                    logger.info("Alerts is turned off.")
+    def _on_secrets_update(self, secrets: SecretsORM) -> None:
+        """
+        Функция вызывается при изменении секретных данных и обновляет подписку,
+        если изменился флаг алертов.
+        :param secrets: Новый снимок секретных данных.
+        :return:
+        """
+        if self._subscribed_alerts is not None and bool(secrets.alerts) != self._subscribed_alerts:
+            self._run_in_background(self._send_subscription())
 
-                # Проыеряем есть ли стратегия в активных стратегияъ
-                if signal.strategy not in self._active_strategies:
-                    logger.debug(f"Ignore signal: {signal}")
-                    continue
+    async def _on_master_connect(self, connection: MasterConnection) -> None:
+        """
+        Функция вызывается после каждого подключения к мастер вебсокету: отправляет подписку
+        на стратегии и запрашивает сигналы, которые были отправлены, пока соединения не было.
+        :param connection: Соединение, которое только что подключилось.
+        :return:
+        """
+        await self._send_subscription(connection)
+
+        last_id: int | None = self._deduplicator.last_id
+        if last_id is not None:
+            logger.info(f"Request missed signals on {connection.name} since id={last_id}")
+            await connection.send({"type": "resume", "last_id": last_id})
+
+    def _dispatch_message(self, frame: dict) -> None:
+        """
+        Функция принимает разобранный фрейм с мастер вебсокета и передает сигналы в шарды.
+        Фрейм "batch" содержит несколько сигналов, они раскладываются по шардам за один проход.
+        :param frame: Фрейм с вебсокета.
+        :return:
+        """
+        frame_type: str = frame.get("type", "signal")
+        if frame_type == "signal":
+            self._dispatch_signal(frame)
+        elif frame_type == "catalog":
+            self._update_catalog(frame)
+        elif frame_type == "license":
+            self._update_license(frame)
+        elif frame_type == "batch":
+            signals: list = frame.get("signals")
+            if not isinstance(signals, list):
+                logger.error(f"WS Error while decode batch: signals is not a list: {frame}")
+                return
+            logger.debug(f"Got batch of {len(signals)} signals")
+            for signal_frame in signals:
+                if isinstance(signal_frame, dict):
+                    self._dispatch_signal(signal_frame)
                 else:
-                    logger.info(f"Process signal: {signal}")
-
-                # Запускаем стратегию
-                api_key, api_secret, api_pass, exchange = await self._get_keys_and_exchange()
-                exchange_obj: ABCExchange = EXCHANGES_CLASSES_FROM_ENUM[exchange](
-                    api_key=api_key,
-                    api_secret=api_secret,
-                    api_pass=api_pass,
-                    signal=signal,
-                    user_strategy=self._active_strategies[signal.strategy])
-                is_success: bool = await exchange_obj.process_signal()
-
-                # Проверяем количество оставшихся сигналов, если сигнал успешно обработан
-                if not is_success or self._active_strategies[signal.strategy].trades_count is None:
-                    continue
+                    logger.error(f"WS Error while decode batch item: expected object: {signal_frame}")
+        else:
+            logger.debug(f"Ignore master frame with type {frame_type}: {frame}")
 
-                # Убалвяем количество оставшихся сделок и информируем юзера
-                self._active_strategies[signal.strategy].trades_count -= 1
+    def _is_master_connected(self) -> bool:
+        """
+        Функция проверяет, есть ли хотя бы одно соединение с мастером, по которому приходят обновления.
+        :return:
+        """
+        return any(master.is_connected for master in self._masters)
+
+    def _update_catalog(self, frame: dict) -> None:
+        """
+        Функция сохраняет список стратегий, который прислал мастер, и сразу останавливает
+        активные стратегии, которых больше нет в списке.
+        Формат: {"type": "catalog", "strategies": ["btc1min", ...]}
+        :param frame:
+        :return:
+        """
+        strategies: list = frame.get("strategies")
+        if not isinstance(strategies, list) or not all(isinstance(name, str) for name in strategies):
+            logger.error(f"WS Error while decode catalog: {frame}")
+            return
+
+        self._catalog = {name.lower() for name in strategies}
+        logger.info(f"Strategies catalog updated: {sorted(self._catalog)}")
+
+        removed: list[str] = [name for name in self._active_strategies if name not in self._catalog]
+        if not removed:
+            return
+        for name in removed:
+            del self._active_strategies[name]
+        logger.warning(f"Stopped strategies removed from catalog: {removed}")
+        self._run_in_background(self._send_subscription())
+        self._run_in_background(AlertWorker.warning(
+            f"Стратегии {', '.join(removed)} удалены с сервера и были остановлены."))
+
+    def _update_license(self, frame: dict) -> None:
+        """
+        Функция сохраняет время истечения лицензии, которое прислал мастер, и планирует
+        остановку всех стратегий на этот момент.
+        Формат: {"type": "license", "expired_at": <timestamp>}
+        :param frame:
+        :return:
+        """
+        try:
+            self._license_expired_at = float(frame["expired_at"])
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"WS Error while decode license: {e}: {frame}")
+            return
+
+        logger.info(f"License expires at {datetime.fromtimestamp(self._license_expired_at)}")
+        if self._license_timer:
+            self._license_timer.cancel()
+        self._license_timer = asyncio.get_running_loop().call_later(
+            max(0., self._license_expired_at - self._clock.master_time()), self._on_license_expired)
+
+    def _on_license_expired(self) -> None:
+        """
+        Функция останавливает все стратегии после истечения лицензии.
+        :return:
+        """
+        self._license_timer = None
+        if not self._active_strategies:
+            return
+
+        logger.warning("License expired, stop all strategies")
+        self._active_strategies.clear()
+        self._run_in_background(self._send_subscription())
+        self._run_in_background(AlertWorker.error("Ваша подписка истекла, все стратегии остановлены."))
+
+    def _dispatch_signal(self, frame: dict) -> None:
+        """
+        Функция декодирует один сигнал и передает его в шард, который соответствует паре (биржа, тикер).
+        :param frame: Фрейм сигнала.
+        :return:
+        """
+        try:
+            signal: Signal = SignalDecoder.decode_signal(frame)
+        except SignalDecodeError as e:
+            logger.error(f"WS Error while decode signal: {e}: {frame}")
+            return
+
+        if not self._deduplicator.is_new(signal):
+            logger.debug(f"Ignore duplicate signal: {signal}")
+            return
+
+        if signal.emitted_at is not None:
+            Metrics.observe("master_latency", self._clock.master_time(signal.received_at) - signal.emitted_at)
+
+        logger.debug(f"Got signal: {signal}")
+        self._dispatcher.put(key=(signal.exchange, signal.ticker), item=signal)
+
+    def _get_signal_priority(self, signal: Signal) -> int:
+        """
+        Функция возвращает приоритет сигнала в очереди шарда:
+        0 - сигнал активной стратегии (будет открыта сделка), 1 - сигнал только для алерта.
+        :param signal: Сигнал
+        :return:
+        """
+        return 0 if signal.strategy in self._active_strategies else 1
+
+    def _is_signal_expired(self, signal: Signal, user_strategy: UserStrategySettings) -> float | None:
+        """
+        Функция проверяет возраст сигнала по часам мастера.
+        Возвращает возраст сигнала в секундах, если он старше допустимого, иначе None.
+        :param signal: Сигнал
+        :param user_strategy: Настройки стратегии пользователя
+        :return:
+        """
+        if signal.emitted_at is None:
+            return None
+
+        max_age: float = user_strategy.max_signal_age if user_strategy.max_signal_age is not None else SIGNAL_MAX_AGE
+        age: float = self._clock.master_time() - signal.emitted_at
+        return age if age > max_age else None
+
+    async def _handle_signal(self, signal: Signal) -> None:
+        """
+        Функция обрабатывает сигнал, полученный с мастер вебсокета.
+        Вызывается рабочим шарда, поэтому сигналы по одному тикеру обрабатываются
+        строго по очереди, а по разным тикерам - параллельно.
+        Сигналы других активных стратегий по тому же тикеру, которые уже ждут в очереди шарда,
+        обрабатываются вместе с этим сигналом по политике SIGNAL_COALESCE_POLICY.
+        :param signal: Сигнал
+        :return:
+        """
+        # Бюджет времени на исполнение сигнала, он передается во все этапы исполнения
+        deadline: Deadline = Deadline(budget=SIGNAL_EXECUTION_BUDGET, stage_timeouts=SIGNAL_STAGE_TIMEOUTS)
+
+        try:
+            # Проыеряем есть ли стратегия в активных стратегияъ и не устарел ли сигнал
+            if not await self._accept_signal(signal):
+                return
+
+            # Забираем из очереди сигналы по этому же тикеру, которые пришли одновременно с этим
+            if SIGNAL_COALESCE_WINDOW:
+                await asyncio.sleep(SIGNAL_COALESCE_WINDOW)
+            coalesced: list[Signal] = [
+                s for s in self._dispatcher.drain(
+                    key=(signal.exchange, signal.ticker),
+                    predicate=lambda s: s.ticker == signal.ticker and s.strategy in self._active_strategies)
+                if await self._accept_signal(s)
+            ]
+
+            # Пока ждали сигналы для объединения, стратегию могли остановить (/stop, каталог мастера,
+            # истечение лицензии), поэтому настройки берутся заново
+            user_strategy: UserStrategySettings | None = self._active_strategies.get(signal.strategy)
+            if user_strategy is None:
+                logger.info(f"Skip signal {signal.strategy} on {signal.ticker}: strategy was stopped")
+                return
+            coalesced = [s for s in coalesced if s.strategy in self._active_strategies]
+
+            # Применяем политику объединения
+            group: list[Signal] = [signal]
+            if coalesced and SIGNAL_COALESCE_POLICY == "aggregate":
+                is_long: bool = signal.take_profit > signal.stop_loss
+                group += [s for s in coalesced if (s.take_profit > s.stop_loss) == is_long]
+                user_strategy = UserStrategySettings(
+                    risk_usdt=sum(self._active_strategies[s.strategy].risk_usdt for s in group),
+                    trades_count=None)
+
+            skipped: list[Signal] = [s for s in coalesced if s not in group]
+            if len(group) > 1:
+                logger.info(f"Aggregate signals on {signal.ticker}: {[s.strategy for s in group]}, "
+                            f"risk={user_strategy.risk_usdt}$")
+                await AlertWorker.info(
+                    f"Сигналы {', '.join(s.strategy for s in group)} по {signal.ticker} объединены "
+                    f"в одну сделку с риском {user_strategy.risk_usdt}$.")
+            if skipped:
+                logger.info(f"Skip coalesced signals on {signal.ticker}: {[s.strategy for s in skipped]}")
                 await AlertWorker.info(
-                    f"Осталось {self._active_strategies[signal.strategy].trades_count} сделок по {signal.strategy}.")
+                    f"Сигналы {', '.join(s.strategy for s in skipped)} по {signal.ticker} пропущены: "
+                    f"по тикеру уже исполняется сигнал {signal.strategy}.")
+
+            # Запускаем стратегию
+            api_key, api_secret, api_pass, exchange = self._get_keys_and_exchange()
+            exchange_obj: ABCExchange = EXCHANGES_CLASSES_FROM_ENUM[exchange](
+                api_key=api_key,
+                api_secret=api_secret,
+                api_pass=api_pass,
+                signal=signal,
+                user_strategy=user_strategy,
+                clients=self._clients,
+                breakers=self._breakers,
+                deadline=deadline)
+            is_success: bool = await exchange_obj.process_signal()
+
+            # Уменьшаем количество оставшихся сделок по каждой стратегии, если сигнал успешно обработан
+            if is_success:
+                for s in group:
+                    await self._consume_trade(s.strategy)
 
-                # Удаляем стратегию из активных, если в ней не осталось сделок
-                if self._active_strategies[signal.strategy].trades_count <= 0:
-                    del self._active_strategies[signal.strategy]
+        except Exception as e:
+            _: str = f"WS Error in _handle_signal func: {signal} : {e}"
+            logger.exception(_)
+            await AlertWorker.error(_)
 
-            except json.decoder.JSONDecodeError:
-                logger.error(f"WS Error while decode msg: {msg}")
-            except Exception as e:
-                _: str = f"WS Error in _worker func: {msg} : {e}"
-                logger.exception(_)
-                await AlertWorker.error(_)
-            finally:
-                self._queue.task_done()
+    async def _accept_signal(self, signal: Signal) -> bool:
+        """
+        Функция отправляет алерт по сигналу и проверяет, нужно ли его исполнять:
+        стратегия должна быть активной, а сигнал - не устаревшим.
+        :param signal: Сигнал
+        :return:
+        """
+        Metrics.observe("queue_wait", time.time() - signal.received_at)
+
+        # Отсылаем алерт, если нужно
+        if self._secrets.alerts:
+            await self._send_alert(signal=signal)
+        else:
+            logger.info("Alerts is turned off.")
+
+        # Проыеряем есть ли стратегия в активных стратегияъ
+        if signal.strategy not in self._active_strategies:
+            logger.debug(f"Ignore signal: {signal}")
+            return False
+        else:
+            logger.info(f"Process signal: {signal}")
+
+        # Проверяем, что сигнал не устарел, пока ждал в очереди или доставлялся после переподключения
+        age: float | None = self._is_signal_expired(signal, self._active_strategies[signal.strategy])
+        if age is not None:
+            logger.warning(f"Drop expired signal ({age:.1f}s): {signal}")
+            await AlertWorker.warning(
+                f"Сигнал {signal.strategy} по {signal.ticker} устарел ({age:.1f} сек.) и не был исполнен.")
+            return False
+        return True
+
+    async def _consume_trade(self, strategy_name: str) -> None:
+        """
+        Функция уменьшает количество оставшихся сделок по стратегии после успешной сделки.
+        :param strategy_name: Название стратегии
+        :return:
+        """
+        if strategy_name not in self._active_strategies or \
+                self._active_strategies[strategy_name].trades_count is None:
+            return
+
+        # Убалвяем количество оставшихся сделок и информируем юзера
+        self._active_strategies[strategy_name].trades_count -= 1
+        await AlertWorker.info(
+            f"Осталось {self._active_strategies[strategy_name].trades_count} сделок по {strategy_name}.")
+
+        # Удаляем стратегию из активных, если в ней не осталось сделок
+        if self._active_strategies[strategy_name].trades_count <= 0:
+            del self._active_strategies[strategy_name]
+            await self._send_subscription()
 
     async def _get_server_available_strategies(self) -> list[str]:
         """
         Функция получает список активных стратегий с главного сервера.
         :return:
         """
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"http://{self._host}:{self._port}/strategies/{self._license_key}") as responce:
-                result: dict = await responce.json()
-                if result["error"]:
-                    raise Exception(result["error"])
-                return result["result"]
+        if self._catalog is not None and self._is_master_connected():
+            return list(self._catalog)
+        return await self._master_api.get_strategies()
 
-    async def _get_keys_and_exchange(self) -> tuple[str, str, str | None, Exchange]:
+    def _get_keys_and_exchange(self) -> tuple[str, str, str | None, Exchange]:
         """
         Функция возвращает ключи в соответствии с биржей сигнала
         :return:
         """
-        await self._update_secrets()
-
         if self._secrets.exchange in [Exchange.BINANCE, Exchange.BINANCE.value]:
             if self._secrets.binance_api_key and self._secrets.binance_api_secret:
                 return self._secrets.binance_api_key, self._secrets.binance_api_secret, None, self._secrets.exchange
@@ -319,11 +725,11 @@ class Logic:
                 logger.error(e)
                 raise ValueError(f"Exchange was not defined by user.")
 
-    async def _send_alert(self, source: SignalDict) -> None:
+    async def _send_alert(self, signal: Signal) -> None:
         """ Function to send telegram alert. """
         try:
             text = f"""
-<b>🤖 Внимание! На {source["ticker"].upper()} 5m вероятен отскок.</b>
+<b>🤖 Внимание! На {signal.ticker.upper()} 5m вероятен отскок.</b>
 
 1. Найдите силу по <a href='https://t.me/filipchuka/1023'>логике CDV.</a>
 2. Определите уровни по <a href='https://t.me/filipchuka/994'>сетке Фибоначчи.</a>
@@ -331,7 +737,7 @@ class Logic:
 Соблюдайте риск менеджмент.
 —
 
-Created by Signal robot v2 | Filipchuk’s method ({source["strategy"]})
+Created by Signal robot v2 | Filipchuk’s method ({signal.strategy})
 —
 
 <i>🐧 Вернуться <a href='https://t.me/filipchuka/1023'>к содержанию тренинга.</a></i>
@@ -1,4 +1,4 @@
-__all__ = ["UserStrategySettings", "Signal", "BreakevenTask", "Candle", "BreakevenType", "Side", "SignalDict", ]
+__all__ = ["UserStrategySettings", "Signal", "BreakevenTask", "Candle", "ExecutionStage", "BreakevenType", "Side", "SignalDict", ]
 
 from .dataclasses import *
 from .enums import *
@@ -1,10 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Callable, Awaitable
 
 from app.database import Exchange
+from .types import SignalDict
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Signal:
     strategy: str
     ticker: str
@@ -14,22 +15,60 @@ class Signal:
     plus_breakeven: float
     minus_breakeven: float
 
-    def as_dict(self) -> dict:
-        as_dict: dict = self.__dict__
-        as_dict["exchange"] = self.exchange.value
+    # Порядковый номер сигнала на главном сервере, по нему запрашиваются пропущенные сигналы
+    id: int | None = None
+
+    # Время отправки сигнала по часам главного сервера (unix timestamp в секундах)
+    emitted_at: float | None = None
+
+    # Локальное время получения сигнала, не участвует в сравнении копий сигнала
+    received_at: float = field(default=0, compare=False)
 
-        return as_dict
+    def as_dict(self) -> SignalDict:
+        return SignalDict(
+            strategy=self.strategy,
+            ticker=self.ticker,
+            exchange=self.exchange.value,
+            take_profit=self.take_profit,
+            stop_loss=self.stop_loss,
+            plus_breakeven=self.plus_breakeven,
+            minus_breakeven=self.minus_breakeven,
+            id=self.id,
+            emitted_at=self.emitted_at,
+        )
 
     @classmethod
-    def from_dict(cls, signal_dict: dict) -> "Signal":
+    def from_dict(cls, signal_dict: dict, received_at: float = 0) -> "Signal":
+        """
+        Создает сигнал из словаря с проверкой типов полей.
+        :param signal_dict: Словарь с полями сигнала.
+        :param received_at: Локальное время получения сигнала.
+        :raises KeyError: если в словаре нет нужного поля или биржа неизвестна.
+        :raises TypeError, ValueError: если поле имеет неверный тип.
+        """
+        strategy, ticker = signal_dict["strategy"], signal_dict["ticker"]
+        if not isinstance(strategy, str) or not isinstance(ticker, str):
+            raise TypeError(f"strategy and ticker must be str, got {strategy!r}, {ticker!r}")
+
+        signal_id = signal_dict.get("id")
+        if signal_id is not None and (not isinstance(signal_id, int) or isinstance(signal_id, bool)):
+            raise TypeError(f"id must be int, got {signal_id!r}")
+
+        emitted_at = signal_dict.get("emitted_at")
+        if emitted_at is not None:
+            emitted_at = float(emitted_at)
+
         return cls(
-            strategy=signal_dict["strategy"].lower(),
-            ticker=signal_dict["ticker"],
+            strategy=strategy.lower(),
+            ticker=ticker,
             exchange=Exchange[signal_dict["exchange"]],
-            take_profit=signal_dict["take_profit"],
-            stop_loss=signal_dict["stop_loss"],
-            minus_breakeven=signal_dict["minus_breakeven"],
-            plus_breakeven=signal_dict["plus_breakeven"]
+            take_profit=float(signal_dict["take_profit"]),
+            stop_loss=float(signal_dict["stop_loss"]),
+            minus_breakeven=float(signal_dict["minus_breakeven"] or 0),
+            plus_breakeven=float(signal_dict["plus_breakeven"] or 0),
+            id=signal_id,
+            emitted_at=emitted_at,
+            received_at=received_at
         )
 
 
@@ -38,6 +77,9 @@ class UserStrategySettings:
     risk_usdt: float
     trades_count: int | None
 
+    # Максимальный возраст сигнала в секундах, если None - то используется SIGNAL_MAX_AGE
+    max_signal_age: float | None = None
+
 
 @dataclass
 class Candle:
@@ -50,6 +92,23 @@ class Candle:
     is_closed: bool
 
 
+@dataclass(frozen=True, slots=True)
+class ExecutionStage:
+    """
+    Этап исполнения сигнала на бирже. Шаги этапа - названия методов коннектора, которые
+    выполняются параллельно. Если какой-то шаг вернул False, исполнение сигнала прекращается.
+    """
+    name: str
+    steps: tuple[str, ...]
+
+    # Можно ли отменить этап по таймауту. Неотменяемый этап (ордер на вход) только проверяет бюджет перед запуском
+    cancellable: bool = True
+
+    # Выполняется ли этап после открытия позиции. Такой этап (выставление стопа и тейка) не отменяется
+    # и не ограничивается бюджетом: его отмена оставила бы открытую позицию без защиты
+    after_entry: bool = False
+
+
 @dataclass
 class BreakevenTask:
     ticker: str
@@ -9,3 +9,5 @@ class SignalDict(TypedDict):
     stop_loss: float
     plus_breakeven: float
     minus_breakeven: float
+    id: int | None
+    emitted_at: float | None
@@ -1,4 +1,21 @@
-__all__ = ["AlertWorker", "CandlesSorter", ]
+__all__ = ["AlertWorker", "CandlesSorter", "SignalDispatcher", "SignalDecoder", "SignalDecodeError", "Backoff",
+           "MasterConnection", "SignalDeduplicator", "ClockSync",
+           "Metrics", "SignalQueue", "MasterAPI",
+           "ClientPool", "Deadline", "DeadlineExceeded", "make_client_order_id", "place_idempotent",
+           "CircuitBreaker", "CircuitBreakers", "CircuitOpenError", ]
 
 from .alert_worker import AlertWorker
 from .candles_sorter import CandlesSorter
+from .signal_dispatcher import SignalDispatcher
+from .signal_decoder import SignalDecoder, SignalDecodeError
+from .backoff import Backoff
+from .master_connection import MasterConnection
+from .signal_deduplicator import SignalDeduplicator
+from .clock_sync import ClockSync
+from .metrics import Metrics
+from .signal_queue import SignalQueue
+from .master_api import MasterAPI
+from .client_pool import ClientPool
+from .deadline import Deadline, DeadlineExceeded
+from .idempotency import make_client_order_id, place_idempotent
+from .circuit_breaker import CircuitBreaker, CircuitBreakers, CircuitOpenError
@@ -0,0 +1,33 @@
+import random
+
+
+class Backoff:
+    """
+    Экспоненциальная задержка с джиттером для переподключений.
+    Первая попытка выполняется сразу, дальше задержка растет от base_delay до max_delay,
+    а джиттер не дает нескольким клиентам переподключаться одновременно.
+    """
+
+    def __init__(self, base_delay: float, max_delay: float, factor: float = 2) -> None:
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._factor = factor
+        self._attempts: int = 0
+
+    def next_delay(self) -> float:
+        """
+        Функция возвращает задержку перед следующей попыткой в секундах.
+        :return:
+        """
+        attempt: int = self._attempts
+        self._attempts += 1
+
+        if attempt == 0:
+            return 0
+
+        delay: float = min(self._max_delay, self._base_delay * self._factor ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self) -> None:
+        """ Сбрасывает счетчик попыток после успешного подключения. """
+        self._attempts = 0
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+from app.config import logger
+from .alert_worker import AlertWorker
+
+
+class CircuitOpenError(Exception):
+    """ Ошибка, когда запрос не выполняется, потому что биржа признана недоступной. """
+
+    def __init__(self, name: str, retry_in: float, probing: bool = False) -> None:
+        """
+        :param name: Название биржи.
+        :param retry_in: Через сколько секунд будет пробный запрос, 0 - если он уже выполняется.
+        :param probing: Выполняется ли сейчас пробный запрос.
+        """
+        if probing:
+            super().__init__(f"circuit for {name} is half open, probe request in flight")
+        else:
+            super().__init__(f"circuit for {name} is open, retry in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+        self.probing = probing
+
+
+class CircuitBreaker:
+    """
+    Класс отслеживает состояние биржи для одного аккаунта и перестает отправлять на нее запросы,
+    если она не отвечает:
+    - "closed" - запросы выполняются, подряд идущие ошибки соединения и медленные ответы считаются;
+    - "open" - после failure_threshold ошибок подряд запросы сразу отклоняются в течение recovery_timeout;
+    - "half_open" - после recovery_timeout пропускается один пробный запрос: если он успешен,
+      состояние становится "closed", иначе снова "open".
+    Пользователь получает один алерт при отключении биржи и один при восстановлении,
+    а не по алерту на каждый отклоненный сигнал.
+    """
+    CLOSED: str = "closed"
+    OPEN: str = "open"
+    HALF_OPEN: str = "half_open"
+
+    def __init__(
+            self,
+            name: str,
+            failure_threshold: int,
+            recovery_timeout: float,
+            slow_call_threshold: float
+    ) -> None:
+        """
+        :param name: Название биржи для логов и алертов.
+        :param failure_threshold: Сколько ошибок подряд переводит в состояние "open".
+        :param recovery_timeout: Сколько секунд отклонять запросы до пробного запроса.
+        :param slow_call_threshold: Запрос дольше этого времени в секундах считается ошибкой.
+        """
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._slow_call_threshold = slow_call_threshold
+
+        self._state: str = self.CLOSED
+        self._failures: int = 0
+        self._opened_at: float = 0
+        self._probe_in_flight: bool = False
+        # Сколько запросов отклонено с момента отключения
+        self._rejected: int = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._recovery_timeout:
+            self._state = self.HALF_OPEN
+        return self._state
+
+    @asynccontextmanager
+    async def guard(self, errors: tuple[type[BaseException], ...]) -> AsyncIterator[None]:
+        """
+        Контекстный менеджер, через который выполняются запросы к бирже.
+        Ошибки из errors и медленные ответы считаются отказом биржи. Остальные ошибки означают,
+        что биржа ответила, поэтому считаются успехом.
+        :param errors: Ошибки соединения и таймауты.
+        :raises CircuitOpenError: если биржа признана недоступной.
+        :return:
+        """
+        state: str = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._probe_in_flight):
+            self._rejected += 1
+            raise CircuitOpenError(
+                name=self._name,
+                retry_in=max(0.0, self._recovery_timeout - (time.monotonic() - self._opened_at)),
+                probing=state == self.HALF_OPEN)
+
+        if state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+        started_at: float = time.monotonic()
+        try:
+            yield
+        except errors:
+            await self._on_failure()
+            raise
+        except asyncio.CancelledError:
+            self._probe_in_flight = False
+            raise
+        except Exception:
+            await self._on_response(time.monotonic() - started_at)
+            raise
+        else:
+            await self._on_response(time.monotonic() - started_at)
+
+    async def _on_response(self, duration: float) -> None:
+        """
+        Функция учитывает ответ биржи, медленный ответ считается отказом.
+        :param duration: Время запроса в секундах.
+        :return:
+        """
+        if duration > self._slow_call_threshold:
+            logger.warning(f"Slow call to {self._name}: {duration:.2f}s")
+            return await self._on_failure()
+
+        self._failures = 0
+        self._probe_in_flight = False
+        if self._state == self.HALF_OPEN:
+            self._state = self.CLOSED
+            logger.success(f"Circuit for {self._name} closed, rejected while open: {self._rejected}")
+            await AlertWorker.success(
+                f"Биржа {self._name} снова отвечает. Пока она была недоступна, отклонено запросов: {self._rejected}.")
+            self._rejected = 0
+
+    async def _on_failure(self) -> None:
+        """
+        Функция учитывает отказ биржи и отключает ее, если отказов слишком много или не удался пробный запрос.
+        :return:
+        """
+        self._failures += 1
+        self._probe_in_flight = False
+        if self._state == self.HALF_OPEN:
+            self._open()
+        elif self._state == self.CLOSED and self._failures >= self._failure_threshold:
+            self._open()
+            await AlertWorker.error(
+                f"Биржа {self._name} не отвечает ({self._failures} ошибок подряд). Сигналы по ней не исполняются, "
+                f"проверка соединения через {self._recovery_timeout:.0f} сек.")
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        logger.warning(f"Circuit for {self._name} opened for {self._recovery_timeout}s")
+
+
+class CircuitBreakers:
+    """
+    Класс хранит предохранители по биржам и аккаунтам. Предохранитель общий для исполнения
+    сигналов, проверки позиций и поддержания соединения, поэтому все они узнают
+    о недоступности биржи одновременно.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float, slow_call_threshold: float) -> None:
+        """
+        :param failure_threshold: Сколько ошибок подряд отключает биржу.
+        :param recovery_timeout: Сколько секунд отклонять запросы до пробного запроса.
+        :param slow_call_threshold: Запрос дольше этого времени в секундах считается ошибкой.
+        """
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._slow_call_threshold = slow_call_threshold
+
+        self._breakers: dict[tuple[Hashable, str], CircuitBreaker] = {}
+
+    def get(self, name: Hashable, account: str) -> CircuitBreaker:
+        """
+        Функция возвращает предохранитель биржи для аккаунта, создает его при первом обращении.
+        :param name: Биржа
+        :param account: Апи ключ аккаунта.
+        :return:
+        """
+        key: tuple[Hashable, str] = (name, account)
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker(
+                name=getattr(name, "value", str(name)),
+                failure_threshold=self._failure_threshold,
+                recovery_timeout=self._recovery_timeout,
+                slow_call_threshold=self._slow_call_threshold)
+        return self._breakers[key]
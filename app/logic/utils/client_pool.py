@@ -0,0 +1,76 @@
+import asyncio
+from typing import Callable, Awaitable, Any, Hashable
+
+from app.config import logger
+
+
+class ClientPool:
+    """
+    Класс хранит долгоживущие клиенты бирж, по одному на биржу, чтобы установка соединения
+    (TLS, ping, получение времени сервера) не попадала на путь исполнения сигнала.
+    Клиент создается при первом обращении и пересоздается только при смене ключей.
+    Клиенты общие для исполнения сигналов, безубытков и проверки позиций.
+    У клиентов должна быть корутина close_connection.
+    """
+
+    def __init__(self, factories: dict[Hashable, Callable[..., Awaitable[Any]]]) -> None:
+        """
+        :param factories: Корутины, которые создают клиент по ключам (api_key, api_secret, api_pass),
+            например {Exchange.BINANCE: Binance.create_client}.
+        """
+        self._factories = factories
+
+        # Клиенты в формате {биржа: (ключи, клиент)}
+        self._clients: dict[Hashable, tuple[tuple, Any]] = {}
+        self._locks: dict[Hashable, asyncio.Lock] = {}
+
+    async def get(self, name: Hashable, api_key: str, api_secret: str, api_pass: str | None = None) -> Any:
+        """
+        Функция возвращает клиент биржи для ключей, создает его, если клиента еще нет
+        или ключи изменились. Старый клиент при этом закрывается.
+        :param name: Биржа
+        :param api_key:
+        :param api_secret:
+        :param api_pass:
+        :return:
+        """
+        keys: tuple = (api_key, api_secret, api_pass)
+        entry: tuple[tuple, Any] | None = self._clients.get(name)
+        if entry and entry[0] == keys:
+            return entry[1]
+
+        async with self._locks.setdefault(name, asyncio.Lock()):
+            # Пока ждали блокировку, клиент мог создать другой вызов
+            entry = self._clients.get(name)
+            if entry and entry[0] == keys:
+                return entry[1]
+
+            client: Any = await self._factories[name](*keys)
+            self._clients[name] = (keys, client)
+            logger.info(f"Client for {name} created")
+
+        if entry:
+            await self._close_client(name, entry[1])
+        return client
+
+    async def close(self) -> None:
+        """
+        Функция закрывает все клиенты.
+        :return:
+        """
+        for name, (_, client) in list(self._clients.items()):
+            await self._close_client(name, client)
+        self._clients.clear()
+
+    @staticmethod
+    async def _close_client(name: Hashable, client: Any) -> None:
+        """
+        Функция закрывает клиент, ошибки только логируются.
+        :param name: Биржа
+        :param client:
+        :return:
+        """
+        try:
+            await client.close_connection()
+        except Exception as e:
+            logger.error(f"Error while closing {name} client: {e}")
@@ -0,0 +1,49 @@
+import time
+from collections import deque
+
+
+class ClockSync:
+    """
+    Класс оценивает смещение локальных часов относительно часов главного сервера
+    по меткам времени ping/pong сообщений (как в NTP).
+    Из последних замеров берется тот, у которого минимальный RTT, потому что
+    у него меньше всего погрешность от асимметрии сети.
+    """
+
+    def __init__(self, samples_limit: int = 8) -> None:
+        # Замеры в формате (rtt, offset) в секундах
+        self._samples: deque[tuple[float, float]] = deque(maxlen=samples_limit)
+
+    @property
+    def is_synced(self) -> bool:
+        return bool(self._samples)
+
+    @property
+    def offset(self) -> float:
+        """
+        Смещение в секундах, которое нужно прибавить к локальному времени, чтобы получить время мастера.
+        :return:
+        """
+        if not self._samples:
+            return 0
+        return min(self._samples)[1]
+
+    def add_sample(self, sent_at: float, server_ts: float, received_at: float) -> float:
+        """
+        Функция добавляет замер по ping/pong и возвращает его RTT.
+        :param sent_at: Локальное время отправки ping.
+        :param server_ts: Время мастера при ответе на ping.
+        :param received_at: Локальное время получения pong.
+        :return:
+        """
+        rtt: float = received_at - sent_at
+        self._samples.append((rtt, server_ts - (sent_at + received_at) / 2))
+        return rtt
+
+    def master_time(self, local_time: float | None = None) -> float:
+        """
+        Функция переводит локальное время во время мастера.
+        :param local_time: Локальное время, по умолчанию текущее.
+        :return:
+        """
+        return (time.time() if local_time is None else local_time) + self.offset
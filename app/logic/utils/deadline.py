@@ -0,0 +1,72 @@
+import asyncio
+import time
+from typing import Awaitable, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """ Ошибка, когда этап исполнения сигнала не уложился в свой бюджет времени. """
+
+    def __init__(self, stage: str, timeout: float) -> None:
+        super().__init__(f"stage '{stage}' exceeded {timeout:.2f}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+class Deadline:
+    """
+    Класс ограничивает время исполнения сигнала: у сигнала есть общий бюджет, а у каждого
+    этапа - свой таймаут. Этап получает меньшее из своего таймаута и оставшегося бюджета
+    и отменяется, если не успел.
+    """
+
+    def __init__(self, budget: float, stage_timeouts: dict[str, float] | None = None) -> None:
+        """
+        :param budget: Общий бюджет в секундах с момента создания.
+        :param stage_timeouts: Таймауты этапов в секундах, этапы без таймаута ограничены только бюджетом.
+        """
+        self._expires_at: float = time.monotonic() + budget
+        self._stage_timeouts: dict[str, float] = stage_timeouts or {}
+
+    @property
+    def remaining(self) -> float:
+        """ Оставшийся бюджет в секундах. """
+        return self._expires_at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def check(self, stage: str) -> None:
+        """
+        Функция проверяет, что бюджет еще не исчерпан, перед этапом, который нельзя отменять,
+        например перед отправкой ордера на вход.
+        :param stage: Название этапа.
+        :raises DeadlineExceeded:
+        :return:
+        """
+        if self.expired:
+            raise DeadlineExceeded(stage, 0)
+
+    async def run(self, stage: str, aw: Awaitable[T]) -> T:
+        """
+        Функция выполняет этап с таймаутом и отменяет его, если он не успел.
+        :param stage: Название этапа.
+        :param aw: Корутина этапа.
+        :raises DeadlineExceeded:
+        :return:
+        """
+        timeout: float | None = self._stage_timeouts.get(stage)
+        timeout = self.remaining if timeout is None else min(timeout, self.remaining)
+        if timeout <= 0:
+            if asyncio.iscoroutine(aw):
+                aw.close()
+            raise DeadlineExceeded(stage, 0)
+
+        try:
+            return await asyncio.wait_for(aw, timeout=timeout)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(stage, timeout)
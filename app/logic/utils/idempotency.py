@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+from typing import Callable, Awaitable, TypeVar
+
+from app.config import logger, ORDER_PLACE_RETRIES, ORDER_RETRY_DELAY
+from ..schemas import Signal
+
+T = TypeVar("T")
+
+# Префикс айди ордеров бота, по нему ордера бота можно отличить от ордеров, созданных вручную
+CLIENT_ORDER_ID_PREFIX: str = "ab"
+
+
+def make_client_order_id(signal: Signal, purpose: str) -> str:
+    """
+    Функция возвращает детерминированный айди ордера для сигнала: повторная отправка того же ордера
+    получает тот же айди, поэтому биржа не откроет вторую позицию, а ордер можно найти по айди.
+    Айди из 32 латинских букв и цифр подходит для newClientOrderId, orderLinkId и clOrdId.
+    :param signal: Сигнал
+    :param purpose: Назначение ордера, например "entry" или "stop_loss".
+    :return:
+    """
+    if signal.id is not None:
+        signal_key: str = str(signal.id)
+    else:
+        # Сигналы без айди различаются по содержимому и времени получения
+        signal_key: str = f"{signal.strategy}:{signal.ticker}:{signal.exchange.value}:{signal.take_profit}:" \
+                          f"{signal.stop_loss}:{signal.emitted_at}:{signal.received_at}"
+
+    digest: str = hashlib.sha1(f"{signal_key}:{purpose}".encode()).hexdigest()
+    return CLIENT_ORDER_ID_PREFIX + digest[:32 - len(CLIENT_ORDER_ID_PREFIX)]
+
+
+async def place_idempotent(
+        place: Callable[[], Awaitable[T]],
+        lookup: Callable[[], Awaitable[T | None]],
+        errors: tuple[type[Exception], ...],
+        retries: int = ORDER_PLACE_RETRIES,
+        delay: float = ORDER_RETRY_DELAY
+) -> T:
+    """
+    Функция создает ордер с детерминированным айди и повторяет попытку, если результат неизвестен
+    (таймаут или обрыв соединения). Перед повтором ордер ищется по айди, и если он уже создан,
+    повторной отправки не будет.
+    :param place: Корутина, которая отправляет ордер.
+    :param lookup: Корутина, которая ищет ордер по айди, возвращает None, если ордера нет.
+    :param errors: Ошибки, после которых результат отправки неизвестен.
+    :param retries: Сколько раз повторять попытку.
+    :param delay: Пауза перед повтором в секундах.
+    :raises: последнюю ошибку, если ни одна попытка не удалась.
+    :return:
+    """
+    last_error: Exception | None = None
+    for attempt in range(retries + 1):
+        if attempt:
+            await asyncio.sleep(delay)
+
+            # Сначала проверяем, не создан ли ордер предыдущей попыткой
+            try:
+                order: T | None = await lookup()
+            except errors as e:
+                logger.warning(f"Can't look up order after failed attempt: {e!r}")
+                last_error = e
+                continue
+            if order is not None:
+                logger.info(f"Order was created by previous attempt: {order}")
+                return order
+
+        try:
+            return await place()
+        except errors as e:
+            logger.warning(f"Order placement result is unknown (attempt {attempt + 1}): {e!r}")
+            last_error = e
+
+    raise last_error
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import Any
+
+import aiohttp
+
+
+class MasterAPI:
+    """
+    Класс для REST запросов к главному серверу.
+    Все запросы идут через одну сессию с keep-alive соединениями, а ответы кешируются на время ttl.
+    Одновременные запросы одного и того же адреса объединяются в один запрос к серверу,
+    например при запуске нескольких стратегий одной командой /trade.
+    """
+
+    def __init__(self, base_url: str, license_key: str, ttl: float, timeout: float) -> None:
+        """
+        :param base_url: Адрес главного сервера в формате "http://host:port".
+        :param license_key: Ключ лицензии.
+        :param ttl: Время жизни закешированного ответа в секундах.
+        :param timeout: Таймаут запроса в секундах.
+        """
+        self._base_url = base_url
+        self._license_key = license_key
+        self._ttl = ttl
+        self._timeout = timeout
+
+        self._session: aiohttp.ClientSession | None = None
+        # Закешированные ответы в формате {путь: (время получения, результат)}
+        self._cache: dict[str, tuple[float, Any]] = {}
+        # Запросы, которые выполняются прямо сейчас
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_license_expired_at(self) -> float:
+        """
+        Функция возвращает время истечения подписки в формате timestamp.
+        :return:
+        """
+        return await self._get_cached(f"/license_key/{self._license_key}")
+
+    async def get_strategies(self) -> list[str]:
+        """
+        Функция возвращает список доступных стратегий на главном сервере.
+        :return:
+        """
+        return await self._get_cached(f"/strategies/{self._license_key}")
+
+    async def close(self) -> None:
+        """
+        Функция закрывает сессию.
+        :return:
+        """
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def _get_cached(self, path: str) -> Any:
+        """
+        Функция возвращает результат из кеша, если он еще не устарел, иначе присоединяется
+        к уже выполняющемуся запросу или делает новый запрос. Ошибки не кешируются.
+        :param path: Путь запроса.
+        :return:
+        """
+        cached: tuple[float, Any] | None = self._cache.get(path)
+        if cached and time.monotonic() - cached[0] < self._ttl:
+            return cached[1]
+
+        if path not in self._inflight:
+            task: asyncio.Task = asyncio.create_task(self._request(path))
+            task.add_done_callback(lambda _: self._inflight.pop(path, None))
+            self._inflight[path] = task
+
+        # shield - чтобы отмена одного из ожидающих не отменяла запрос для остальных
+        return await asyncio.shield(self._inflight[path])
+
+    async def _request(self, path: str) -> Any:
+        """
+        Функция делает GET запрос к главному серверу и сохраняет результат в кеш.
+        :param path: Путь запроса.
+        :raises Exception: если сервер вернул ошибку.
+        :return:
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                base_url=self._base_url,
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+
+        async with self._session.get(path) as responce:
+            result: dict = await responce.json()
+        if result["error"]:
+            raise Exception(result["error"])
+
+        self._cache[path] = (time.monotonic(), result["result"])
+        return result["result"]
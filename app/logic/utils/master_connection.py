@@ -0,0 +1,193 @@
+import asyncio
+import time
+from typing import Callable, Awaitable
+
+import websockets
+from websockets import WebSocketClientProtocol, Subprotocol
+
+from app.config import logger, WS_RECONNECT_BASE_DELAY, WS_RECONNECT_MAX_DELAY, WS_PING_INTERVAL, WS_MASTER_ENCODING, \
+    WS_STALL_TIMEOUT, WS_CLOSE_TIMEOUT, WS_PROTOCOL_PING_TIMEOUT
+from .backoff import Backoff
+from .clock_sync import ClockSync
+from .metrics import Metrics
+from .signal_decoder import SignalDecoder, SignalDecodeError
+
+
+class MasterConnection:
+    """
+    Класс держит вебсокет соединение с главным сервером и переподключается при ошибках:
+    первая попытка выполняется сразу, дальше - с экспоненциальной задержкой и джиттером.
+    Сообщения разбираются здесь один раз, служебные pong-сообщения обновляют смещение часов,
+    остальные передаются в on_message.
+    Кодировка сообщений (msgpack или json) согласуется при подключении через subprotocol.
+    Если мастер отвечает на ping, соединение без сообщений дольше WS_STALL_TIMEOUT считается
+    зависшим и переоткрывается, не дожидаясь таймаутов библиотеки.
+    Для мастера без ping приложения зависание определяет ping протокола websocket с укороченными
+    интервалом и таймаутом, а RTT берется из задержки ответа на него.
+    """
+
+    def __init__(
+            self,
+            url: str,
+            name: str,
+            clock: ClockSync,
+            on_message: Callable[[dict], None],
+            on_connect: Callable[["MasterConnection"], Awaitable[None]] | None = None
+    ) -> None:
+        """
+        :param url: Адрес мастер вебсокета.
+        :param name: Название соединения для логов, когда соединений несколько.
+        :param clock: Общий для всех соединений объект оценки смещения часов мастера.
+        :param on_message: Функция, которая принимает каждый разобранный фрейм с вебсокета.
+        :param on_connect: Корутина, которая вызывается после каждого подключения,
+            например для запроса пропущенных сигналов.
+        """
+        self.url = url
+        self.name = name
+        self._clock = clock
+        self._on_message = on_message
+        self._on_connect = on_connect
+
+        self._ws: WebSocketClientProtocol | None = None
+        self._encoding: str = SignalDecoder.JSON
+        # Отвечает ли мастер на ping в текущем соединении, только тогда включается проверка зависания
+        self._heartbeat_supported: bool = False
+        self._backoff: Backoff = Backoff(base_delay=WS_RECONNECT_BASE_DELAY, max_delay=WS_RECONNECT_MAX_DELAY)
+
+    @property
+    def is_connected(self) -> bool:
+        return self._ws is not None and self._ws.open
+
+    async def send(self, payload: dict) -> None:
+        """
+        Функция отправляет сообщение на главный сервер.
+        :param payload: Сообщение.
+        :raises ConnectionError: если соединение сейчас не установлено.
+        :return:
+        """
+        if not self.is_connected:
+            raise ConnectionError(f"WS {self.name} is not connected")
+        await self._ws.send(SignalDecoder.encode_frame(payload, self._encoding))
+
+    async def run(self) -> None:
+        """
+        Функция в бесконечном цикле подключается к мастер вебсокету и получает сообщения.
+        :return:
+        """
+        while True:
+            connected_at: float | None = None
+            ping_task: asyncio.Task | None = None
+            try:
+                async with websockets.connect(
+                        self.url,
+                        subprotocols=[Subprotocol(p) for p in SignalDecoder.get_subprotocols(WS_MASTER_ENCODING)],
+                        close_timeout=WS_CLOSE_TIMEOUT,
+                        ping_interval=WS_PING_INTERVAL,
+                        ping_timeout=WS_PROTOCOL_PING_TIMEOUT
+                ) as ws:  # ws: WebSocketClientProtocol
+                    # Старый мастер не выбирает subprotocol, тогда остается json
+                    self._encoding = ws.subprotocol if ws.subprotocol in SignalDecoder.ENCODINGS \
+                        else SignalDecoder.JSON
+                    self._ws = ws
+                    self._heartbeat_supported = False
+                    connected_at = time.monotonic()
+                    logger.success(f"WS {self.name} connected to: {self.url} ({self._encoding})")
+
+                    if self._on_connect:
+                        await self._on_connect(self)
+                    ping_task = asyncio.create_task(self._ping_loop())
+
+                    while True:
+                        self._handle_message(await self._recv(ws))
+            except websockets.exceptions.ConnectionClosed as e:
+                logger.error(f"WS {self.name} connection error in recv ws msg: {e}")
+            except ConnectionError as e:
+                logger.error(f"WS {self.name} reconnect: {e}")
+            except Exception as e:
+                logger.exception(f"WS {self.name} unknown error in recv ws msg: {e}")
+            finally:
+                self._ws = None
+                if ping_task:
+                    ping_task.cancel()
+
+            # Сбрасываем задержку, только если соединение продержалось дольше максимальной задержки,
+            # иначе сервер, который сразу закрывает соединение, приведет к переподключениям без пауз.
+            if connected_at is not None and time.monotonic() - connected_at > WS_RECONNECT_MAX_DELAY:
+                self._backoff.reset()
+
+            delay: float = self._backoff.next_delay()
+            logger.info(f"Reconnect WS {self.name} in {delay:.2f} seconds")
+            await asyncio.sleep(delay)
+
+    async def _recv(self, ws: WebSocketClientProtocol) -> str | bytes:
+        """
+        Функция получает сообщение с вебсокета. Если мастер отвечает на ping, то сообщения
+        приходят не реже интервала ping, и долгая тишина означает зависшее соединение.
+        :param ws:
+        :raises ConnectionError: если соединение зависло.
+        :return:
+        """
+        if not self._heartbeat_supported:
+            return await ws.recv()
+        try:
+            return await asyncio.wait_for(ws.recv(), timeout=WS_STALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"no messages for {WS_STALL_TIMEOUT} seconds, connection stalled")
+
+    def _handle_message(self, msg: str | bytes) -> None:
+        """
+        Функция разбирает сообщение и передает его дальше.
+        :param msg: Сообщение с вебсокета.
+        :return:
+        """
+        try:
+            frame: dict = SignalDecoder.decode_frame(msg, self._encoding)
+        except SignalDecodeError as e:
+            logger.error(f"WS {self.name} error while decode msg: {e}: {msg!r}")
+            return
+
+        # Ошибка обработки одного сообщения не должна обрывать соединение с мастером
+        try:
+            if frame.get("type") == "pong":
+                self._handle_pong(frame)
+            else:
+                self._on_message(frame)
+        except Exception as e:
+            logger.exception(f"WS {self.name} error while handle msg: {e}: {frame!r}")
+
+    def _handle_pong(self, frame: dict) -> None:
+        """
+        Функция обновляет смещение часов по ответу на ping.
+        Формат: {"type": "pong", "ts": <время отправки ping>, "server_ts": <время мастера>}
+        :param frame:
+        :return:
+        """
+        try:
+            rtt: float = self._clock.add_sample(
+                sent_at=float(frame["ts"]),
+                server_ts=float(frame["server_ts"]),
+                received_at=time.time())
+            self._heartbeat_supported = True
+            Metrics.observe("master_rtt", rtt)
+            logger.debug(f"WS {self.name} rtt={rtt * 1000:.1f}ms clock offset={self._clock.offset * 1000:.1f}ms")
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"WS {self.name} invalid pong: {e}: {frame}")
+
+    async def _ping_loop(self) -> None:
+        """
+        Функция периодически отправляет ping с локальным временем, мастер отвечает pong
+        со своим временем, по которым считается смещение часов.
+        Если мастер не отвечает на ping приложения, RTT берется из ping протокола websocket.
+        :return:
+        """
+        while self.is_connected:
+            try:
+                await self.send({"type": "ping", "ts": time.time()})
+            except Exception as e:
+                logger.error(f"WS {self.name} error while ping: {e}")
+            await asyncio.sleep(WS_PING_INTERVAL)
+
+            # Мастер не отвечает на ping приложения, RTT берем по ping протокола
+            ws: WebSocketClientProtocol | None = self._ws
+            if not self._heartbeat_supported and ws is not None and ws.latency:
+                Metrics.observe("master_rtt", ws.latency)
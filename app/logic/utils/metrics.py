@@ -0,0 +1,59 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class Metrics:
+    """
+    Класс собирает замеры задержек в скользящем окне и считает по ним статистику.
+    Как и AlertWorker, используется через методы класса из любой части логики.
+    """
+    __WINDOW: int = 500
+    __SAMPLES: dict[str, deque[float]] = {}
+
+    @classmethod
+    def observe(cls, name: str, value: float) -> None:
+        """
+        Функция сохраняет замер.
+        :param name: Название метрики, например "queue_wait".
+        :param value: Значение в секундах.
+        :return:
+        """
+        if name not in cls.__SAMPLES:
+            cls.__SAMPLES[name] = deque(maxlen=cls.__WINDOW)
+        cls.__SAMPLES[name].append(value)
+
+    @classmethod
+    @contextmanager
+    def measure(cls, name: str) -> Iterator[None]:
+        """
+        Контекстный менеджер, который сохраняет время выполнения блока кода, в том числе при ошибке.
+        :param name: Название метрики, например "order_ack".
+        :return:
+        """
+        started_at: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.observe(name, time.perf_counter() - started_at)
+
+    @classmethod
+    def summary(cls) -> dict[str, dict[str, float]]:
+        """
+        Функция возвращает статистику по всем метрикам:
+        {"queue_wait": {"count": 10, "p50": 0.01, "p95": 0.2, "max": 0.3}, ...}
+        :return:
+        """
+        result: dict[str, dict[str, float]] = {}
+        for name, samples in cls.__SAMPLES.items():
+            if not samples:
+                continue
+            ordered: list[float] = sorted(samples)
+            result[name] = {
+                "count": len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1],
+            }
+        return result
@@ -0,0 +1,100 @@
+import time
+
+import msgpack
+import orjson
+
+from ..schemas import Signal
+
+
+class SignalDecodeError(ValueError):
+    """ Ошибка декодирования сообщения с мастер вебсокета. """
+
+
+class SignalDecoder:
+    """
+    Класс декодирует сообщения с мастер вебсокета сразу в неизменяемый Signal за один проход:
+    orjson разбирает фрейм, а Signal.from_dict проверяет типы полей без промежуточных копий.
+    Фрейм разбирается один раз в decode_frame, дальше по полю "type" он передается
+    либо в decode_signal, либо в обработчик служебных сообщений.
+    Мастер может прислать несколько сигналов в одном сообщении: {"type": "batch", "signals": [...]}
+    или просто массивом сигналов, массив приводится к фрейму "batch".
+    Кодировка выбирается при подключении через subprotocol вебсокета: msgpack (бинарные фреймы)
+    или json. Если мастер не выбрал subprotocol, используется json.
+    """
+    JSON: str = "json"
+    MSGPACK: str = "msgpack"
+    ENCODINGS: tuple[str, ...] = (MSGPACK, JSON)
+
+    @classmethod
+    def get_subprotocols(cls, preferred: str) -> list[str]:
+        """
+        Функция возвращает список subprotocol для подключения в порядке предпочтения.
+        :param preferred: Предпочитаемая кодировка, json всегда остается запасной.
+        :return:
+        """
+        if preferred not in cls.ENCODINGS:
+            raise ValueError(f"Unknown encoding: {preferred}")
+        return [preferred] + [encoding for encoding in cls.ENCODINGS if encoding != preferred]
+
+    @classmethod
+    def encode_frame(cls, payload: dict, encoding: str = JSON) -> str | bytes:
+        """
+        Функция кодирует сообщение для отправки на мастер.
+        :param payload: Сообщение.
+        :param encoding: Кодировка, выбранная при подключении.
+        :return:
+        """
+        if encoding == cls.MSGPACK:
+            return msgpack.packb(payload)
+        return orjson.dumps(payload).decode()
+
+    @classmethod
+    def decode_frame(cls, raw: str | bytes, encoding: str = JSON) -> dict:
+        """
+        Функция разбирает сообщение с вебсокета.
+        :param raw: Сообщение с вебсокета.
+        :param encoding: Кодировка, выбранная при подключении.
+        :raises SignalDecodeError: если сообщение невалидное, текст ошибки уже пригоден для лога.
+        :return:
+        """
+        try:
+            if encoding == cls.MSGPACK:
+                frame: dict = msgpack.unpackb(raw)
+            else:
+                frame: dict = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            raise SignalDecodeError(f"invalid json: {e}")
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise SignalDecodeError(f"invalid msgpack: {e!r}")
+
+        if isinstance(frame, list):
+            return {"type": "batch", "signals": frame}
+        if not isinstance(frame, dict):
+            raise SignalDecodeError(f"expected object or array, got {type(frame).__name__}")
+        return frame
+
+    @staticmethod
+    def decode_signal(frame: dict) -> Signal:
+        """
+        Функция превращает разобранный фрейм в сигнал.
+        :param frame: Фрейм из decode_frame.
+        :raises SignalDecodeError: если в фрейме нет нужных полей или они неверного типа.
+        :return:
+        """
+        try:
+            return Signal.from_dict(signal_dict=frame, received_at=time.time())
+        except KeyError as e:
+            raise SignalDecodeError(f"missing or unknown field: {e}")
+        except (TypeError, ValueError) as e:
+            raise SignalDecodeError(f"invalid field value: {e}")
+
+    @classmethod
+    def decode(cls, raw: str | bytes, encoding: str = JSON) -> Signal:
+        """
+        Функция декодирует сообщение с вебсокета сразу в сигнал.
+        :param raw: Сообщение с вебсокета.
+        :param encoding: Кодировка, выбранная при подключении.
+        :raises SignalDecodeError:
+        :return:
+        """
+        return cls.decode_signal(cls.decode_frame(raw, encoding))
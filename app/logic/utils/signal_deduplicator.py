@@ -0,0 +1,66 @@
+import time
+
+from ..schemas import Signal
+
+
+class SignalDeduplicator:
+    """
+    Класс отсеивает повторные копии сигналов, например когда один и тот же сигнал пришел
+    по нескольким соединениям с главным сервером или был повторно отправлен после переподключения.
+    Сигналы с айди сравниваются по айди, сигналы без айди - по содержимому в пределах окна.
+    """
+
+    def __init__(self, ids_limit: int, window: float) -> None:
+        """
+        :param ids_limit: Сколько последних айди хранить.
+        :param window: Окно в секундах, в котором одинаковые сигналы без айди считаются копиями.
+        """
+        self._ids_limit = ids_limit
+        self._window = window
+
+        # dict используется как упорядоченное множество
+        self._seen_ids: dict[int, None] = {}
+        self._seen_signals: dict[Signal, float] = {}
+
+        # Наибольший полученный айди, с него запрашиваются пропущенные сигналы
+        self.last_id: int | None = None
+
+    def is_new(self, signal: Signal) -> bool:
+        """
+        Функция возвращает True для первой копии сигнала и False для всех последующих.
+        :param signal: Сигнал
+        :return:
+        """
+        if signal.id is None:
+            return self._is_new_by_content(signal)
+
+        if signal.id in self._seen_ids:
+            return False
+
+        self._seen_ids[signal.id] = None
+        if len(self._seen_ids) > self._ids_limit:
+            del self._seen_ids[next(iter(self._seen_ids))]
+
+        if self.last_id is None or signal.id > self.last_id:
+            self.last_id = signal.id
+        return True
+
+    def _is_new_by_content(self, signal: Signal) -> bool:
+        """
+        Функция сравнивает сигнал без айди с сигналами, полученными в пределах окна.
+        :param signal:
+        :return:
+        """
+        now: float = time.monotonic()
+
+        # Удаляем устаревшие сигналы, они хранятся в порядке получения
+        for seen_signal, seen_at in list(self._seen_signals.items()):
+            if now - seen_at <= self._window:
+                break
+            del self._seen_signals[seen_signal]
+
+        if signal in self._seen_signals:
+            return False
+
+        self._seen_signals[signal] = now
+        return True
@@ -0,0 +1,100 @@
+import asyncio
+import zlib
+from typing import Callable, Awaitable, Any, Hashable
+
+from app.config import logger
+
+
+class SignalDispatcher:
+    """
+    Класс распределяет сообщения по шардам в зависимости от ключа (биржа, тикер).
+    Сообщения с одинаковым ключом всегда попадают в один шард и обрабатываются строго
+    по очереди, сообщения с разными ключами обрабатываются параллельно.
+    Рабочий шарда запускается только при появлении в нем сообщений и завершается после
+    простоя, поэтому количество рабочих растет вместе с нагрузкой.
+    Очередь шарда создается через queue_factory, например SignalQueue с приоритетами.
+    """
+
+    def __init__(
+            self,
+            handler: Callable[[Any], Awaitable[None]],
+            shards_count: int,
+            idle_timeout: float,
+            queue_factory: Callable[[], asyncio.Queue] = asyncio.Queue
+    ) -> None:
+        """
+        :param handler: Корутина, которая обрабатывает одно сообщение.
+        :param shards_count: Количество шардов (максимальное количество рабочих).
+        :param idle_timeout: Время простоя в секундах, после которого рабочий шарда завершается.
+        :param queue_factory: Функция, которая создает очередь шарда.
+        """
+        self._handler = handler
+        self._idle_timeout = idle_timeout
+
+        self._queues: list[asyncio.Queue] = [queue_factory() for _ in range(shards_count)]
+        self._workers: dict[int, asyncio.Task] = {}
+
+    @property
+    def workers_count(self) -> int:
+        """ Количество запущенных в данный момент рабочих. """
+        return len(self._workers)
+
+    def put(self, key: Hashable, item: Any) -> bool:
+        """
+        Функция кладет сообщение в очередь шарда и запускает его рабочего, если он не запущен.
+        :param key: Ключ, по которому определяется шард, например (биржа, тикер).
+        :param item: Сообщение, которое нужно обработать.
+        :return: False, если очередь шарда не приняла сообщение.
+        """
+        shard: int = self._get_shard(key)
+        if self._queues[shard].put_nowait(item) is False:
+            return False
+
+        if shard not in self._workers:
+            self._workers[shard] = asyncio.create_task(self._worker(shard))
+        return True
+
+    def drain(self, key: Hashable, predicate: Callable[[Any], bool]) -> list[Any]:
+        """
+        Функция забирает из очереди шарда сообщения, подходящие под условие, чтобы обработать
+        их вместе с текущим. Очередь шарда должна поддерживать take, как SignalQueue.
+        :param key: Ключ, по которому определяется шард.
+        :param predicate: Условие
+        :return:
+        """
+        return self._queues[self._get_shard(key)].take(predicate)
+
+    def _get_shard(self, key: Hashable) -> int:
+        """
+        Функция определяет номер шарда по ключу.
+        Используется crc32, чтобы распределение не зависело от PYTHONHASHSEED.
+        :param key:
+        :return:
+        """
+        return zlib.crc32(repr(key).encode()) % len(self._queues)
+
+    async def _worker(self, shard: int) -> None:
+        """
+        Рабочий, который последовательно обрабатывает сообщения одного шарда.
+        :param shard: Номер шарда.
+        :return:
+        """
+        queue: asyncio.Queue = self._queues[shard]
+        logger.debug(f"Shard {shard} worker started")
+
+        while True:
+            try:
+                item: Any = await asyncio.wait_for(queue.get(), timeout=self._idle_timeout)
+            except asyncio.TimeoutError:
+                if queue.empty():
+                    del self._workers[shard]
+                    logger.debug(f"Shard {shard} worker stopped after idle")
+                    return
+                continue
+
+            try:
+                await self._handler(item)
+            except Exception as e:
+                logger.exception(f"Error in shard {shard} worker: {e}")
+            finally:
+                queue.task_done()
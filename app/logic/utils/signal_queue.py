@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Callable, Any, Hashable
+
+from app.config import logger
+
+
+class SignalQueue(asyncio.Queue):
+    """
+    Ограниченная очередь с приоритетами и схлопыванием одинаковых сообщений.
+    Сообщения с меньшим приоритетом выдаются раньше, при равном приоритете - в порядке поступления.
+    Сообщения с одинаковым ключом, пришедшие в пределах окна, схлопываются в одно.
+    При переполнении применяется политика:
+    - "drop_new" - новое сообщение отбрасывается;
+    - "drop_oldest" - вытесняется самое старое сообщение с наихудшим приоритетом, если его
+      приоритет не лучше нового, иначе отбрасывается новое.
+    """
+    OVERFLOW_POLICIES: tuple[str, ...] = ("drop_new", "drop_oldest")
+
+    def __init__(
+            self,
+            maxsize: int,
+            priority: Callable[[Any], int],
+            collapse_key: Callable[[Any], Hashable] | None = None,
+            collapse_window: float = 0,
+            overflow: str = "drop_oldest"
+    ) -> None:
+        """
+        :param maxsize: Максимальное количество сообщений в очереди.
+        :param priority: Функция, которая возвращает приоритет сообщения (0 - наивысший).
+        :param collapse_key: Функция, которая возвращает ключ для схлопывания, если None - не схлопывать.
+        :param collapse_window: Окно в секундах, в котором сообщения с одинаковым ключом схлопываются.
+        :param overflow: Политика при переполнении.
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        super().__init__(maxsize=maxsize)
+        self._priority = priority
+        self._collapse_key = collapse_key
+        self._collapse_window = collapse_window
+        self._overflow = overflow
+
+        self._counter = itertools.count()
+        # Время последнего принятого сообщения по ключу, хранится в порядке поступления
+        self._collapsed_at: dict[Hashable, float] = {}
+
+    def _init(self, maxsize: int) -> None:
+        # Куча из (приоритет, порядковый номер, сообщение)
+        self._queue: list[tuple[int, int, Any]] = []
+
+    def _put(self, item: Any) -> None:
+        heapq.heappush(self._queue, (self._priority(item), next(self._counter), item))
+
+    def _get(self) -> Any:
+        return heapq.heappop(self._queue)[2]
+
+    def put_nowait(self, item: Any) -> bool:
+        """
+        Функция кладет сообщение в очередь с учетом схлопывания и политики переполнения.
+        :param item: Сообщение
+        :return: True, если сообщение принято, False - если схлопнуто или отброшено.
+        """
+        if self._is_collapsed(item):
+            logger.debug(f"Collapse queued item: {item}")
+            return False
+
+        if self.full() and not self._evict(self._priority(item)):
+            logger.warning(f"Queue is full ({self.qsize()}), drop item: {item}")
+            return False
+
+        super().put_nowait(item)
+        return True
+
+    def take(self, predicate: Callable[[Any], bool]) -> list[Any]:
+        """
+        Функция забирает из очереди все сообщения, подходящие под условие, в порядке выдачи.
+        Забранные сообщения сразу отмечаются выполненными.
+        :param predicate: Условие
+        :return:
+        """
+        taken: list[tuple[int, int, Any]] = [entry for entry in self._queue if predicate(entry[2])]
+        if not taken:
+            return []
+
+        self._queue = [entry for entry in self._queue if not predicate(entry[2])]
+        heapq.heapify(self._queue)
+        for _ in taken:
+            self.task_done()
+        # Освободилось место, будим тех, кто ждет в put
+        self._wakeup_next(self._putters)
+        return [entry[2] for entry in sorted(taken)]
+
+    def _is_collapsed(self, item: Any) -> bool:
+        """
+        Функция проверяет, было ли в пределах окна сообщение с таким же ключом, и запоминает ключ.
+        :param item: Сообщение
+        :return:
+        """
+        if self._collapse_key is None or self._collapse_window <= 0:
+            return False
+
+        now: float = time.monotonic()
+        for key, accepted_at in list(self._collapsed_at.items()):
+            if now - accepted_at <= self._collapse_window:
+                break
+            del self._collapsed_at[key]
+
+        key: Hashable = self._collapse_key(item)
+        if key in self._collapsed_at:
+            return True
+
+        self._collapsed_at[key] = now
+        return False
+
+    def _evict(self, priority: int) -> bool:
+        """
+        Функция освобождает место под новое сообщение в соответствии с политикой переполнения.
+        :param priority: Приоритет нового сообщения.
+        :return: True, если место освобождено.
+        """
+        if self._overflow == "drop_new" or not self._queue:
+            return False
+
+        # Самое старое сообщение с наихудшим приоритетом
+        victim: tuple[int, int, Any] = max(self._queue, key=lambda entry: (entry[0], -entry[1]))
+        if victim[0] < priority:
+            return False
+
+        self._queue.remove(victim)
+        heapq.heapify(self._queue)
+        # Вытесненное сообщение не будет обработано, поэтому сразу отмечаем его выполненным
+        self.task_done()
+        logger.warning(f"Queue is full, evict item: {victim[2]}")
+        return True
@@ -0,0 +1,162 @@
+"""
+Сравнение выставления стоп-лосса и тейк-профита на binance.com: по одному ордеру ("sequential")
+и одним запросом к batchOrders ("batch").
+
+Вместо биржи поднимается локальный сервер с задержкой LATENCY на каждый запрос. Он проверяет
+пакетные ордера так же, как batchOrders: closePosition в пакете не принимается, reduceOnly ордер
+должен иметь количество больше нуля.
+
+Запуск из корня репозитория:
+    python -m bench.binance_protective_orders
+"""
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs, unquote_plus
+
+from aiohttp import web
+
+from app import config
+from app.database import Exchange
+from app.logic.connectors.binance_con import exchange as binance_exchange
+from app.logic.connectors.binance_con.client import AsyncClient
+from app.logic.schemas import Signal, UserStrategySettings
+from app.logic.utils import AlertWorker, CircuitBreakers, ClientPool, Deadline
+
+HOST: str = "127.0.0.1"
+PORT: int = 8799
+
+# Задержка ответа биржи в секундах
+LATENCY: float = 0.03
+
+# Сколько раз повторить каждый режим
+ROUNDS: int = 5
+
+
+class BinanceStandIn:
+    """ Локальная замена эндпоинтов /fapi/v1/order и /fapi/v1/batchOrders. """
+
+    def __init__(self) -> None:
+        self.orders: dict[int, dict] = {}
+        self.requests: int = 0
+        # Отклонять тейк-профит в пакете, чтобы проверить создание ордера по одному
+        self.fail_take_profit: bool = False
+
+    @staticmethod
+    async def _params(request: web.Request) -> dict:
+        return {**request.query, **{k: v[0] for k, v in parse_qs(await request.text()).items()}}
+
+    def _create(self, params: dict) -> dict:
+        order: dict = {
+            "orderId": len(self.orders) + 1,
+            "symbol": params["symbol"],
+            "type": params["type"],
+            "status": "NEW",
+            "clientOrderId": params.get("newClientOrderId"),
+            "origQty": params.get("quantity", "0"),
+            "executedQty": "0",
+        }
+        self.orders[order["orderId"]] = order
+        return order
+
+    async def order(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        if request.method == "POST":
+            return web.json_response(self._create(await self._params(request)))
+
+        query = request.query
+        for order in self.orders.values():
+            if str(order["orderId"]) == query.get("orderId") or \
+                    (query.get("origClientOrderId") and order["clientOrderId"] == query.get("origClientOrderId")):
+                if order["type"] == "MARKET":
+                    order["status"], order["executedQty"] = "FILLED", order["origQty"]
+                return web.json_response(order)
+        return web.json_response({"code": -2013, "msg": "Order does not exist."}, status=400)
+
+    async def batch_orders(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(LATENCY)
+        raw: str = (await self._params(request))["batchOrders"]
+        results: list[dict] = []
+        for order in json.loads(unquote_plus(raw) if raw.startswith("%") else raw):
+            if "closePosition" in order:
+                results.append({"code": -1106, "msg": "Parameter 'closePosition' sent when not required."})
+            elif order.get("reduceOnly") != "true" or float(order.get("quantity", 0)) <= 0:
+                results.append({"code": -1102, "msg": "Mandatory parameter 'quantity' was not sent."})
+            elif self.fail_take_profit and order["type"] == "TAKE_PROFIT_MARKET":
+                results.append({"code": -2021, "msg": "Order would immediately trigger."})
+            else:
+                results.append(self._create(order))
+        return web.json_response(results)
+
+
+async def run_once(stand_in: BinanceStandIn, mode: str) -> tuple[float, int]:
+    """
+    Функция открывает позицию и выставляет стоп и тейк в заданном режиме.
+    :return: Время от отправки ордера на вход до выставления стопа и тейка и количество запросов.
+    """
+    config.BINANCE_PROTECTIVE_ORDERS_MODE = mode
+    client: AsyncClient = AsyncClient("key", "secret")
+    client.FUTURES_URL = f"http://{HOST}:{PORT}/fapi"
+
+    async def factory(*_) -> AsyncClient:
+        return client
+
+    signal: Signal = Signal("bench", "XRPUSDT", Exchange.BINANCE, 2, 0.5, 0, 0, id=time.time_ns() % 10 ** 9)
+    binance = binance_exchange.Binance(
+        signal=signal,
+        user_strategy=UserStrategySettings(10, None),
+        api_key="key",
+        api_secret="secret",
+        api_pass=None,
+        clients=ClientPool({Exchange.BINANCE: factory}),
+        breakers=CircuitBreakers(3, 30, 5),
+        deadline=Deadline(10))
+    binance.side, binance.quantity = "BUY", 10.0
+    await binance._init_client()
+
+    stand_in.requests = 0
+    started_at: float = time.perf_counter()
+    assert await binance._create_entry_order()
+    await binance._create_protective_orders()
+    duration: float = time.perf_counter() - started_at
+
+    await client.close_connection()
+    return duration, stand_in.requests
+
+
+async def main() -> None:
+    alerts: list[str] = []
+
+    async def collect(message: str) -> None:
+        alerts.append(message)
+
+    for name in ("error", "success", "warning", "info"):
+        setattr(AlertWorker, name, staticmethod(collect))
+    binance_exchange.exchange_info.round_price = lambda symbol, price: price
+    binance_exchange.exchange_info.round_quantity = lambda symbol, quantity: round(quantity, 1)
+
+    stand_in = BinanceStandIn()
+    app = web.Application()
+    app.router.add_route("*", "/fapi/v1/order", stand_in.order)
+    app.router.add_post("/fapi/v1/batchOrders", stand_in.batch_orders)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    for mode in ("sequential", "batch"):
+        results: list[tuple[float, int]] = [await run_once(stand_in, mode) for _ in range(ROUNDS)]
+        average: float = sum(duration for duration, _ in results) / ROUNDS
+        print(f"{mode:>10}: {average * 1000:.0f} ms, requests: {results[0][1]}")
+
+    stand_in.fail_take_profit = True
+    alerts.clear()
+    await run_once(stand_in, "batch")
+    print("batch with rejected take profit:", *[a for a in alerts if a.startswith("Ордера")], sep="\n")
+
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
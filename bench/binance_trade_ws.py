@@ -0,0 +1,126 @@
+"""
+Сравнение задержки запросов binance.com через REST и через Websocket API фьючерсов
+(order.place, order.status, account.position).
+
+Вместо биржи поднимаются локальные REST и вебсокет серверы с одинаковой задержкой LATENCY.
+Кроме задержки проверяется, что ошибка биржи приходит как BinanceAPIException с кодом,
+а после закрытия вебсокета запросы снова идут через REST.
+Локальный сервер не воспроизводит TLS и заголовки HTTP, поэтому выигрыш вебсокета здесь
+меньше, чем с настоящей биржей.
+
+Запуск из корня репозитория:
+    python -m bench.binance_trade_ws
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import orjson
+import websockets
+from aiohttp import web
+from binance.exceptions import BinanceAPIException
+
+from app.logic.connectors.binance_con.client import AsyncClient
+from app.logic.connectors.binance_con.trade_ws import BinanceTradeWebSocket
+
+HOST: str = "127.0.0.1"
+REST_PORT: int = 8803
+WS_PORT: int = 8804
+
+# Задержка ответа биржи в секундах
+LATENCY: float = 0.03
+
+# Сколько запросов каждого типа отправить
+REQUESTS: int = 30
+
+ORDER: dict = {"symbol": "XRPUSDT", "type": "MARKET", "side": "BUY", "quantity": "10"}
+
+
+def handle(method: str, params: dict) -> tuple[int, dict | list]:
+    """
+    Функция отвечает на запрос так же, как биржа, для REST и вебсокета.
+    :return: HTTP статус и тело ответа.
+    """
+    if method == "order.status" and params.get("orderId") == "404":
+        return 400, {"code": -2013, "msg": "Order does not exist."}
+    if method == "account.position":
+        return 200, [{"symbol": params.get("symbol"), "positionAmt": "0"}]
+    return 200, {"orderId": 1, "status": "NEW", "symbol": params.get("symbol"), "type": params.get("type", "MARKET")}
+
+
+async def ws_handler(ws) -> None:
+    async def reply(message: dict) -> None:
+        await asyncio.sleep(LATENCY)
+        status, result = handle(message["method"], message["params"])
+        body: dict = {"result": result} if status == 200 else {"error": result}
+        await ws.send(orjson.dumps({"id": message["id"], "status": status, **body}).decode())
+
+    async for raw in ws:
+        asyncio.create_task(reply(orjson.loads(raw)))
+
+
+async def rest_handler(request: web.Request) -> web.Response:
+    await asyncio.sleep(LATENCY)
+    params: dict = {**request.query, **await request.post()}
+    method: str = {
+        "order": "order.place" if request.method == "POST" else "order.status",
+        "positionRisk": "account.position",
+    }[request.match_info["path"]]
+    status, result = handle(method, params)
+    return web.json_response(result, status=status)
+
+
+async def measure(call: Callable[[], Awaitable]) -> float:
+    """
+    :return: Среднее время запроса в миллисекундах.
+    """
+    started_at: float = time.perf_counter()
+    for _ in range(REQUESTS):
+        await call()
+    return (time.perf_counter() - started_at) / REQUESTS * 1000
+
+
+async def measure_all(client: AsyncClient) -> list[float]:
+    return [
+        await measure(lambda: client.futures_create_order(**ORDER)),
+        await measure(lambda: client.futures_get_order(symbol="XRPUSDT", orderId="1")),
+        await measure(lambda: client.futures_position_information(symbol="XRPUSDT")),
+    ]
+
+
+async def main() -> None:
+    app = web.Application()
+    app.router.add_route("*", "/fapi/{version}/{path}", rest_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, REST_PORT).start()
+    server = await websockets.serve(ws_handler, HOST, WS_PORT)
+
+    BinanceTradeWebSocket.url = f"ws://{HOST}:{WS_PORT}"
+    client: AsyncClient = AsyncClient("key", "secret")
+    client.FUTURES_URL = f"http://{HOST}:{REST_PORT}/fapi"
+
+    rest: list[float] = await measure_all(client)
+    client.enable_trade_ws(request_timeout=5)
+    await asyncio.sleep(0.3)
+    ws: list[float] = await measure_all(client)
+    for name, rest_ms, ws_ms in zip(("order.place", "order.status", "account.position"), rest, ws):
+        print(f"{name:>16}: rest {rest_ms:.1f} ms, ws {ws_ms:.1f} ms")
+
+    try:
+        await client.futures_get_order(symbol="XRPUSDT", orderId="404")
+    except BinanceAPIException as e:
+        print(f"ws error is raised as BinanceAPIException, code {e.code}")
+
+    server.close()
+    await server.wait_closed()
+    await asyncio.sleep(0.1)
+    order: dict = await client.futures_create_order(**ORDER)
+    print(f"ws closed (connected: {client.trade_ws.is_connected}), order sent via rest: {order['status']}")
+
+    await client.close_connection()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Сравнение доставки сигналов с мастер вебсокета по одному сигналу в сообщении и пакетами
+({"type": "batch", "signals": [...]} или просто массив сигналов).
+
+Локальный мастер отправляет SIGNALS сигналов, время считается от первого до последнего сигнала,
+переданного в шарды. Сигналы не исполняются на бирже, обработчик шарда только считает их.
+
+Запуск из корня репозитория:
+    python -m bench.master_batch_frames
+"""
+import asyncio
+import time
+
+import orjson
+import websockets
+
+from app.config import logger
+from app.database import Database, SecretsORM
+from app.logic import Logic
+from app.logic import logic as logic_module
+from app.logic.schemas import Signal
+
+HOST: str = "127.0.0.1"
+PORT: int = 8769
+
+# Сколько сигналов отправить
+SIGNALS: int = 5000
+
+# Сколько сигналов в одном пакете
+BATCH_SIZE: int = 50
+
+
+def make_signal(signal_id: int) -> dict:
+    return {
+        "id": signal_id, "strategy": f"s{signal_id}", "ticker": f"T{signal_id % 300}USDT", "exchange": "BINANCE",
+        "take_profit": 1, "stop_loss": 0.5, "plus_breakeven": 0, "minus_breakeven": 0,
+    }
+
+
+async def run(db: Database, batch_size: int) -> float:
+    """
+    Функция отправляет сигналы пакетами заданного размера через локальный мастер.
+    :param db: База данных с ключом лицензии локального мастера.
+    :param batch_size: Размер пакета, 1 - каждый сигнал отдельным сообщением.
+    :return: Время доставки всех сигналов в шарды в секундах.
+    """
+    async def handler(ws) -> None:
+        await asyncio.sleep(0.2)
+        if batch_size == 1:
+            for i in range(SIGNALS):
+                await ws.send(orjson.dumps(make_signal(i)).decode())
+        else:
+            for start in range(0, SIGNALS, batch_size):
+                await ws.send(orjson.dumps([make_signal(i) for i in range(start, start + batch_size)]).decode())
+        await ws.wait_closed()
+
+    server = await websockets.serve(handler, HOST, PORT)
+    logic = Logic(secrets=db.secrets_repo.snapshot, db=db)
+
+    done = asyncio.Event()
+    handled: int = 0
+    started_at: float | None = None
+
+    async def handle(_: Signal) -> None:
+        nonlocal handled, started_at
+        if started_at is None:
+            started_at = time.perf_counter()
+        handled += 1
+        if handled == SIGNALS:
+            done.set()
+
+    logic._dispatcher._handler = handle
+    task: asyncio.Task = asyncio.create_task(logic._masters[0].run())
+    await asyncio.wait_for(done.wait(), timeout=60)
+    duration: float = time.perf_counter() - started_at
+
+    task.cancel()
+    server.close()
+    await server.wait_closed()
+    return duration
+
+
+async def main() -> None:
+    logger.remove()
+    # Все сигналы должны поместиться в очередь шарда
+    logic_module.SIGNAL_QUEUE_MAXSIZE = SIGNALS
+
+    db: Database = await Database.create("sqlite+aiosqlite:///:memory:")
+    await db.secrets_repo.add(SecretsORM(
+        license_key=f"key:{HOST}:{PORT}", bot_token="1:a", admin_telegram_id=1, alerts=False))
+
+    single: float = await run(db, batch_size=1)
+    batched: float = await run(db, batch_size=BATCH_SIZE)
+    print(f"{SIGNALS} signals, one per frame: {single:.3f}s")
+    print(f"{SIGNALS} signals, {BATCH_SIZE} per frame: {batched:.3f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
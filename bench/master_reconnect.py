@@ -0,0 +1,90 @@
+"""
+Проверка переподключения к мастер вебсокету и запроса пропущенных сигналов.
+
+Локальный мастер отправляет сигналы 1, 2, 3 и закрывает первое соединение. После переподключения
+он ждет запрос {"type": "resume", "last_id": 3} и отправляет сигнал 3 повторно и новый сигнал 4.
+Ожидается, что первая попытка переподключения идет сразу, а каждый сигнал исполняется один раз.
+
+Запуск из корня репозитория:
+    python -m bench.master_reconnect
+"""
+import asyncio
+import time
+
+import orjson
+import websockets
+
+from app.database import Database, SecretsORM
+from app.logic import Logic
+from app.logic.schemas import Signal
+
+HOST: str = "127.0.0.1"
+PORT: int = 8765
+
+
+def make_signal(signal_id: int) -> str:
+    # У каждого сигнала своя стратегия, иначе очередь шарда схлопнет их в один
+    return orjson.dumps({
+        "id": signal_id, "strategy": f"s{signal_id}", "ticker": "XRPUSDT", "exchange": "BINANCE",
+        "take_profit": 1, "stop_loss": 0.5, "plus_breakeven": 0, "minus_breakeven": 0,
+    }).decode()
+
+
+class MasterStandIn:
+    """ Локальный мастер, который обрывает первое соединение. """
+
+    def __init__(self) -> None:
+        self.connections: int = 0
+        self.closed_at: float | None = None
+        self.reconnect_delay: float | None = None
+        self.messages: list[dict] = []
+
+    async def handler(self, ws) -> None:
+        self.connections += 1
+        if self.connections == 1:
+            for signal_id in (1, 2, 3):
+                await ws.send(make_signal(signal_id))
+            await ws.close()
+            self.closed_at = time.perf_counter()
+            return
+
+        self.reconnect_delay = time.perf_counter() - self.closed_at
+        async for raw in ws:
+            message: dict = orjson.loads(raw)
+            self.messages.append(message)
+            if message.get("type") == "resume":
+                for signal_id in range(message["last_id"], 5):
+                    await ws.send(make_signal(signal_id))
+
+
+async def main() -> None:
+    stand_in = MasterStandIn()
+    server = await websockets.serve(stand_in.handler, HOST, PORT)
+
+    db: Database = await Database.create("sqlite+aiosqlite:///:memory:")
+    await db.secrets_repo.add(SecretsORM(
+        license_key=f"key:{HOST}:{PORT}", bot_token="1:a", admin_telegram_id=1, alerts=False))
+    logic = Logic(secrets=db.secrets_repo.snapshot, db=db)
+
+    handled: list[int] = []
+
+    async def handle(signal: Signal) -> None:
+        handled.append(signal.id)
+
+    # Вместо исполнения сигнала на бирже только запоминаем его айди
+    logic._dispatcher._handler = handle
+    task: asyncio.Task = asyncio.create_task(logic._masters[0].run())
+    await asyncio.sleep(1)
+
+    print(f"connections: {stand_in.connections}, reconnect after {stand_in.reconnect_delay * 1000:.0f} ms")
+    print("sent by client after reconnect:", *stand_in.messages, sep="\n  ")
+    print("handled signals:", handled)
+    assert sorted(handled) == [1, 2, 3, 4], handled
+
+    task.cancel()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Проверка подписки на активные стратегии по мастер вебсокету.
+
+Локальный мастер присылает список стратегий и запоминает сообщения {"type": "subscribe", ...}.
+Клиент должен отправлять полный список активных стратегий при подключении, при добавлении
+и удалении стратегии, когда у стратегии закончились сделки и когда меняется настройка алертов.
+
+Запуск из корня репозитория:
+    python -m bench.master_subscribe
+"""
+import asyncio
+
+import orjson
+import websockets
+
+from app.database import Database, SecretsORM
+from app.logic import Logic
+
+HOST: str = "127.0.0.1"
+PORT: int = 8768
+
+
+class MasterStandIn:
+    """ Локальный мастер, который присылает список стратегий и запоминает подписки клиента. """
+
+    def __init__(self) -> None:
+        self.subscriptions: list[dict] = []
+
+    async def handler(self, ws) -> None:
+        await ws.send(orjson.dumps({"type": "catalog", "strategies": ["s1", "s2"]}).decode())
+        async for raw in ws:
+            message: dict = orjson.loads(raw)
+            if message.get("type") == "subscribe":
+                self.subscriptions.append(message)
+
+
+async def main() -> None:
+    stand_in = MasterStandIn()
+    server = await websockets.serve(stand_in.handler, HOST, PORT)
+
+    db: Database = await Database.create("sqlite+aiosqlite:///:memory:")
+    await db.secrets_repo.add(SecretsORM(
+        license_key=f"key:{HOST}:{PORT}", bot_token="1:a", admin_telegram_id=1, alerts=False))
+    logic = Logic(secrets=db.secrets_repo.snapshot, db=db)
+    tasks: list[asyncio.Task] = [asyncio.create_task(master.run()) for master in logic._masters]
+    await asyncio.sleep(0.3)
+
+    steps: list[str] = ["connect"]
+    await logic.add_user_strategy("S1", 1, None)
+    steps.append("add s1")
+    await logic.add_user_strategy("s2", 1, 1)
+    steps.append("add s2 with one trade")
+    logic.remove_user_startegy("s1")
+    await asyncio.sleep(0.1)
+    steps.append("remove s1")
+    await logic._consume_trade("s2")
+    steps.append("s2 out of trades")
+    secrets: SecretsORM = await db.secrets_repo.get()
+    secrets.alerts = True
+    await db.secrets_repo.update(secrets)
+    await asyncio.sleep(0.1)
+    steps.append("alerts on")
+
+    for step, subscription in zip(steps, stand_in.subscriptions):
+        print(f"{step:>22}: {subscription}")
+    assert len(stand_in.subscriptions) == len(steps), stand_in.subscriptions
+    assert stand_in.subscriptions[-1] == {"type": "subscribe", "strategies": [], "alerts": True}
+
+    for task in tasks:
+        task.cancel()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Время декодирования фрейма мастер вебсокета в Signal через SignalDecoder.
+
+Для сравнения измеряется разбор тем же фреймом через стандартный json. Невалидные фреймы
+должны давать SignalDecodeError с коротким текстом для лога, а не произвольное исключение.
+
+Запуск из корня репозитория:
+    python -m bench.signal_decode
+"""
+import json
+import timeit
+
+from app.logic.schemas import Signal
+from app.logic.utils.signal_decoder import SignalDecoder, SignalDecodeError
+
+# Сколько раз декодировать фрейм в одном замере
+NUMBER: int = 100_000
+
+FRAME: dict = {
+    "id": 123456,
+    "strategy": "BTC1min",
+    "ticker": "BTCUSDT",
+    "exchange": "BINANCE",
+    "take_profit": 65000.5,
+    "stop_loss": 61000.25,
+    "plus_breakeven": 63500,
+    "minus_breakeven": 0,
+    "emitted_at": 1718000000.123,
+}
+
+MALFORMED: list[str | bytes] = [
+    "{not json",
+    "42",
+    '{"strategy": "s"}',
+    '{"strategy": 1, "ticker": "BTCUSDT", "exchange": "BINANCE", "take_profit": 1, "stop_loss": 1, '
+    '"plus_breakeven": 0, "minus_breakeven": 0}',
+    '{"strategy": "s", "ticker": "BTCUSDT", "exchange": "UNKNOWN", "take_profit": 1, "stop_loss": 1, '
+    '"plus_breakeven": 0, "minus_breakeven": 0}',
+    '{"strategy": "s", "ticker": "BTCUSDT", "exchange": "BINANCE", "take_profit": "x", "stop_loss": 1, '
+    '"plus_breakeven": 0, "minus_breakeven": 0}',
+]
+
+
+def measure(name: str, decode) -> None:
+    best: float = min(timeit.repeat(decode, number=NUMBER, repeat=5))
+    print(f"{name:>22}: {best / NUMBER * 1e6:.2f} us per frame")
+
+
+def main() -> None:
+    raw_json: str = SignalDecoder.encode_frame(FRAME, SignalDecoder.JSON)
+    raw_msgpack: bytes = SignalDecoder.encode_frame(FRAME, SignalDecoder.MSGPACK)
+    assert SignalDecoder.decode(raw_json) == SignalDecoder.decode(raw_msgpack, SignalDecoder.MSGPACK)
+
+    measure("SignalDecoder json", lambda: SignalDecoder.decode(raw_json))
+    measure("SignalDecoder msgpack", lambda: SignalDecoder.decode(raw_msgpack, SignalDecoder.MSGPACK))
+    measure("stdlib json", lambda: Signal.from_dict(json.loads(raw_json)))
+
+    for raw in MALFORMED:
+        try:
+            SignalDecoder.decode(raw)
+        except SignalDecodeError as e:
+            print(f"rejected {raw[:30]!r}...: {e}")
+        else:
+            raise AssertionError(f"malformed frame was decoded: {raw!r}")
+
+
+if __name__ == "__main__":
+    main()